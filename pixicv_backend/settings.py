@@ -49,15 +49,31 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Add this at the top
+    # Server-Timing header, per-request log line and query budgets
+    'profiles.instrumentation.RequestMetricsMiddleware',
+    # Opt-in sampled/slow request capture; inert unless configured below
+    'profiles.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'profiles.routing.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request profiling (profiles/profiling.py): the fraction of profile API
+# requests run under cProfile, and the latency above which a request is
+# captured with stack samples. Captures are browsable at /admin/captures/.
+PROFILING_SAMPLE_RATE = float(os.environ.get('PIXICV_PROFILE_SAMPLE_RATE', '0'))
+PROFILING_SLOW_REQUEST_MS = float(os.environ.get('PIXICV_SLOW_REQUEST_MS', '0')) or None
+PROFILING_STORE_DIR = BASE_DIR / 'var' / 'captures'
+PROFILING_STORE_MAX_FILES = 200
+
+# Query budgets (profiles/instrumentation.py) fail requests under test
+TEST_RUNNER = 'profiles.instrumentation.BudgetTestRunner'
+
 ROOT_URLCONF = 'pixicv_backend.urls'
 
 TEMPLATES = [
@@ -77,17 +93,110 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'pixicv_backend.wsgi.application'
 
+# Route the hot profile GETs to the async views in profiles/async_views.py.
+# Only worth enabling when served through pixicv_backend.asgi; under WSGI
+# every async view pays for a fresh event loop.
+ASYNC_READ_VIEWS = os.environ.get('PIXICV_ASYNC_READ_VIEWS', '').lower() in ('1', 'true', 'yes')
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Configured from the environment, e.g. for PostgreSQL:
+#   PIXICV_DB_ENGINE=django.db.backends.postgresql PIXICV_DB_NAME=pixicv
+#   PIXICV_DB_HOST=db PIXICV_DB_USER=... PIXICV_DB_PASSWORD=...
+# Setting PIXICV_DB_REPLICA_NAME (and/or PIXICV_DB_REPLICA_HOST) adds a
+# 'replica' alias serving safe-method reads of the profile API (see
+# profiles/routing.py). The replica needs a shared cache (see CACHES below)
+# for its read-your-writes pins. Locally a copied SQLite file works as the
+# replica, with a file-based cache:
+#   cp db.sqlite3 replica.sqlite3 && PIXICV_DB_REPLICA_NAME=replica.sqlite3 \
+#   PIXICV_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache \
+#   PIXICV_CACHE_LOCATION=/tmp/pixicv-cache ...
+#
+# PIXICV_SQLITE_PRODUCTION=1 tunes SQLite for several concurrent workers:
+# WAL lets readers run alongside the single writer, writes take the lock up
+# front (BEGIN IMMEDIATE) and wait for it instead of failing with "database
+# is locked" on upgrade. Measure with `manage.py benchmark_sqlite`.
+SQLITE_PRODUCTION = os.environ.get('PIXICV_SQLITE_PRODUCTION', '').lower() in ('1', 'true', 'yes')
+SQLITE_PRODUCTION_OPTIONS = {
+    'transaction_mode': 'IMMEDIATE',
+    # Busy timeout, in seconds
+    'timeout': 20,
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA cache_size=-20000;'  # 20 MB page cache
+        'PRAGMA mmap_size=134217728;'  # 128 MB memory-mapped reads
+        'PRAGMA temp_store=MEMORY;'
+    ),
+}
+
+
+def database_from_env(prefix, defaults=None):
+    defaults = defaults or {}
+    engine = os.environ.get(f'{prefix}ENGINE', defaults.get('ENGINE', 'django.db.backends.sqlite3'))
+    name = os.environ.get(f'{prefix}NAME', defaults.get('NAME', 'db.sqlite3'))
+    if engine == 'django.db.backends.sqlite3':
+        name = BASE_DIR / name
+    max_age = os.environ.get('PIXICV_DB_CONN_MAX_AGE', '60')
+    database = {
+        'ENGINE': engine,
+        'NAME': name,
+        'HOST': os.environ.get(f'{prefix}HOST', defaults.get('HOST', '')),
+        'PORT': os.environ.get(f'{prefix}PORT', defaults.get('PORT', '')),
+        'USER': os.environ.get(f'{prefix}USER', defaults.get('USER', '')),
+        'PASSWORD': os.environ.get(f'{prefix}PASSWORD', defaults.get('PASSWORD', '')),
+        # Persistent connections, checked before reuse; 'none' keeps them open forever
+        'CONN_MAX_AGE': None if max_age.lower() == 'none' else int(max_age),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if engine == 'django.db.backends.sqlite3' and SQLITE_PRODUCTION:
+        database['OPTIONS'].update(SQLITE_PRODUCTION_OPTIONS)
+    if engine == 'django.db.backends.postgresql' and os.environ.get('PIXICV_DB_POOL', '').lower() in ('1', 'true', 'yes'):
+        # psycopg connection pool (needs psycopg[pool]); replaces persistent connections
+        database['OPTIONS']['pool'] = True
+        database['CONN_MAX_AGE'] = 0
+    return database
+
+
 DATABASES = {
+    'default': database_from_env('PIXICV_DB_'),
+}
+if os.environ.get('PIXICV_DB_REPLICA_NAME') or os.environ.get('PIXICV_DB_REPLICA_HOST'):
+    DATABASES['replica'] = database_from_env('PIXICV_DB_REPLICA_', defaults=DATABASES['default'])
+    # The test runner points the replica at the test primary
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['profiles.routing.ReplicaRouter']
+# How long a client that wrote keeps reading from the primary
+DATABASE_REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Rendered profile documents are cached with versioned keys (profiles/cache.py).
+# Use a shared backend such as Redis or Memcached when running several
+# workers so that invalidations reach every process, e.g.:
+#   PIXICV_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   PIXICV_CACHE_LOCATION=redis://cache:6379/1
+# Refresh tokens are only known to be "not blacklisted" without a query when
+# the backend is shared (profiles/tokens.py).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('PIXICV_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('PIXICV_CACHE_LOCATION', 'pixicv'),
     }
 }
 
+PROFILE_DETAIL_CACHE_TIMEOUT = 60 * 60
+
+# Seconds before a worker rebuilds its in-memory skill matching index
+# (profiles/matching.py); writes in the same process apply immediately.
+SKILL_INDEX_TTL = 15 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -110,7 +219,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'profiles.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -118,7 +227,7 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'profiles.pagination.HybridPagination',
     'PAGE_SIZE': 20
 }
 
@@ -150,11 +259,19 @@ SIMPLE_JWT = {
 
     'JTI_CLAIM': 'jti',
 
+    # Adds the username claim read by token-only endpoints
+    'TOKEN_OBTAIN_SERIALIZER': 'profiles.authentication.ClaimsTokenObtainPairSerializer',
+    # Answers blacklist checks from the cache (profiles/tokens.py)
+    'TOKEN_REFRESH_SERIALIZER': 'profiles.tokens.CachedBlacklistTokenRefreshSerializer',
+
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=60),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Seconds an authenticated user stays cached (profiles/authentication.py)
+AUTH_USER_CACHE_TIMEOUT = 60
+
 # CORS Configuration (for frontend integration)
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React default
@@ -191,4 +308,15 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Media serving (profiles/media.py). Set the backend to 'x-accel-redirect'
+# behind nginx (with an internal location at MEDIA_ACCEL_REDIRECT_PREFIX
+# aliasing MEDIA_ROOT) or 'x-sendfile' behind Apache so that Python workers
+# never stream file bytes themselves.
+MEDIA_SENDFILE_BACKEND = os.environ.get('PIXICV_MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+# Background threads generating project image thumbnails (profiles/images.py)
+PROJECT_IMAGE_WORKERS = 2
\ No newline at end of file
@@ -1,7 +1,6 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -9,6 +8,10 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from profiles import views
+from profiles.async_views import with_async_reads
+from profiles.batch import BatchView
+from profiles.media import serve_media
+from profiles.profiling import capture_detail, capture_list
 from profiles.auth_views import register, logout, user_profile, protected_test
 from profiles.views import ProfileSkillsView ,ProfileProjectsView  # Import your new view here
 
@@ -22,10 +25,15 @@ router.register(r'certifications', views.CertificationViewSet)
 router.register(r'projects', views.ProjectViewSet)
 
 urlpatterns = [
+    path('admin/captures/', capture_list, name='request-captures'),
+    path('admin/captures/<str:name>/', capture_detail, name='request-capture'),
     path('admin/', admin.site.urls),
 
     # API endpoints via router
-    path('api/', include(router.urls)),
+    path('api/', include(with_async_reads(router.urls) if settings.ASYNC_READ_VIEWS else router.urls)),
+
+    # Several API requests in one round trip, authenticated once
+    path('api/batch/', BatchView.as_view(), name='batch'),
 
     # JWT Authentication endpoints
     path('api/auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -44,6 +52,11 @@ urlpatterns = [
     path('api-auth/', include('rest_framework.urls')),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve the hot profile reads from async views when running under ASGI
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = with_async_reads(urlpatterns)
+
+# Serve media files with range, cache-validator and sendfile support
+urlpatterns += [
+    path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', serve_media, name='media'),
+]
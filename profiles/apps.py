@@ -5,4 +5,5 @@ class ProfilesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profiles'
     def ready(self):
+        import profiles.checks
         import profiles.signals
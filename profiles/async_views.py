@@ -0,0 +1,216 @@
+"""
+Async (ASGI-native) implementations of the hot profile read endpoints.
+
+They answer plain GETs with Django's async ORM and cache API, so under ASGI
+a request waiting on the database does not hold a worker thread. Anything
+they do not handle (writes, ?fields=/?expand=, cursor pagination, format
+suffixes) is delegated to the regular DRF view. ``with_async_reads`` swaps
+them into the URL patterns when ``ASYNC_READ_VIEWS`` is enabled.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage, Paginator
+from django.http import HttpResponse
+from django.urls import URLPattern
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import CachedJWTAuthentication
+from .cache import aget_or_render_detail
+from .conditional import evaluate_conditions, set_validators
+from .models import EmployeeProfile, Skill, Education, Certification, Project
+from .serializers import (
+    EmployeeProfileDetailSerializer,
+    EmployeeProfileListSerializer,
+    SkillSerializer,
+    EducationSerializer,
+    CertificationSerializer,
+    ProjectSerializer
+)
+
+SECTION_SOURCES = (
+    ('skills', Skill, SkillSerializer),
+    ('education', Education, EducationSerializer),
+    ('certifications', Certification, CertificationSerializer),
+    ('projects', Project, ProjectSerializer),
+)
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def authenticate(request):
+    """Return ``(user, None)`` or ``(None, 401 response)``"""
+    authenticator = CachedJWTAuthentication()
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+    except exceptions.APIException as exc:
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = json_response(data, exc.status_code)
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return None, response
+    if result is None:
+        response = json_response(
+            {'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED
+        )
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+        return None, response
+    return result[0], None
+
+
+async def section_rows(model, profile_id):
+    return [row async for row in model.objects.filter(profile_id=profile_id)]
+
+
+async def render_detail(profile_id, context):
+    """
+    The EmployeeProfileDetailSerializer document, with the profile and its
+    four sections requested together rather than one after another.
+    """
+    profile, *sections = await asyncio.gather(
+        EmployeeProfile.objects.select_related('owner').aget(pk=profile_id),
+        *(section_rows(model, profile_id) for _, model, _ in SECTION_SOURCES),
+    )
+    serializer = EmployeeProfileDetailSerializer(profile, context=context)
+    for name, _, _ in SECTION_SOURCES:
+        serializer.fields.pop(name)
+    data = dict(serializer.data)
+    for (name, _, section_serializer), rows in zip(SECTION_SOURCES, sections):
+        data[name] = section_serializer(rows, many=True, context=context).data
+    return data
+
+
+async def conditional(request, last_modified, render):
+    etag, timestamp, response = evaluate_conditions(request, last_modified)
+    if response is None:
+        response = json_response(await render())
+    return set_validators(response, etag, timestamp)
+
+
+async def profile_list(request, **kwargs):
+    if set(request.GET) - {'page'}:
+        return None
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    queryset = EmployeeProfile.objects.select_related('owner').order_by('joined_at', 'id')
+    paginator = Paginator(queryset, api_settings.PAGE_SIZE)
+    paginator.count = await queryset.acount()
+    try:
+        page = paginator.page(request.GET.get('page', 1))
+    except InvalidPage:
+        return json_response({'detail': 'Invalid page.'}, status.HTTP_404_NOT_FOUND)
+    rows = [profile async for profile in queryset[page.start_index() - 1:page.end_index()]]
+
+    url = request.build_absolute_uri()
+    previous = None
+    if page.has_previous():
+        number = page.previous_page_number()
+        previous = remove_query_param(url, 'page') if number == 1 else replace_query_param(url, 'page', number)
+    return json_response({
+        'count': paginator.count,
+        'next': replace_query_param(url, 'page', page.next_page_number()) if page.has_next() else None,
+        'previous': previous,
+        'results': EmployeeProfileListSerializer(rows, many=True, context={'request': request}).data,
+    })
+
+
+async def profile_detail(request, pk, **kwargs):
+    if request.GET:
+        return None
+    user, error = await authenticate(request)
+    if error:
+        return error
+    try:
+        profile_id = int(pk)
+    except ValueError:
+        return json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+
+    last_modified = await EmployeeProfile.objects.filter(pk=profile_id).values_list('updated_at', flat=True).afirst()
+    if last_modified is None:
+        return json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+
+    context = {'request': request}
+    return await conditional(request, last_modified, lambda: aget_or_render_detail(
+        profile_id, lambda: render_detail(profile_id, context), variant=request.build_absolute_uri('/')
+    ))
+
+
+async def my_profile(request, **kwargs):
+    if request.GET:
+        return None
+    user, error = await authenticate(request)
+    if error:
+        return error
+
+    found = await EmployeeProfile.objects.filter(owner=user).values_list('id', 'updated_at').afirst()
+    if found is None:
+        return json_response({'detail': 'Profile not found'}, status.HTTP_404_NOT_FOUND)
+    profile_id, last_modified = found
+    return await conditional(request, last_modified, lambda: aget_or_render_detail(
+        profile_id, lambda: render_detail(profile_id, {})
+    ))
+
+
+def section_view(model, serializer_class):
+    async def view(request, profile_id, **kwargs):
+        user, error = await authenticate(request)
+        if error:
+            return error
+        last_modified = await EmployeeProfile.objects.filter(id=profile_id).values_list('updated_at', flat=True).afirst()
+        if last_modified is None:
+            return json_response({'detail': 'Profile not found'}, status.HTTP_404_NOT_FOUND)
+
+        async def render():
+            return serializer_class(await section_rows(model, profile_id), many=True).data
+        return await conditional(request, last_modified, render)
+    return view
+
+
+profile_skills = section_view(Skill, SkillSerializer)
+profile_projects = section_view(Project, ProjectSerializer)
+
+ASYNC_READS = {
+    'employeeprofile-list': profile_list,
+    'employeeprofile-detail': profile_detail,
+    'employeeprofile-my-profile': my_profile,
+    'profile-skills': profile_skills,
+    'profile-projects': profile_projects,
+}
+
+
+def async_read(sync_view, handler):
+    """
+    Serve GETs from the async ``handler``; other methods, and GETs the
+    handler declines by returning None, go to the DRF view.
+    """
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET' and 'format' not in kwargs:
+            response = await handler(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+    # DRF views handle CSRF themselves
+    view.csrf_exempt = True
+    # For in-process callers that already hold the authenticated user
+    # (batch.py), and so the replica router sees the DRF view's class
+    view.sync_view = sync_view
+    return view
+
+
+def with_async_reads(patterns):
+    """Copy of ``patterns`` with the hot read routes served by the async views"""
+    swapped = []
+    for pattern in patterns:
+        handler = ASYNC_READS.get(getattr(pattern, 'name', None))
+        if isinstance(pattern, URLPattern) and handler is not None:
+            pattern = URLPattern(
+                pattern.pattern, async_read(pattern.callback, handler), pattern.default_args, pattern.name
+            )
+        swapped.append(pattern)
+    return swapped
@@ -1,12 +1,15 @@
 # profiles/auth_views.py
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from .authentication import tokens_for_user
+from .instrumentation import query_budget
+from .tokens import CachedBlacklistRefreshToken
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -26,6 +29,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+@query_budget(12)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
@@ -33,7 +37,7 @@ def register(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         return Response({
             'user': {
                 'id': user.id,
@@ -56,7 +60,7 @@ def logout(request):
     try:
         refresh_token = request.data["refresh"]
         print(f"Received refresh token: {refresh_token}")  # Add this line
-        token = RefreshToken(refresh_token)
+        token = CachedBlacklistRefreshToken(refresh_token)
         token.blacklist()
         return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -64,6 +68,7 @@ def logout(request):
         return Response({'error': 'Invalid token'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(1)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
@@ -78,10 +83,13 @@ def user_profile(request):
         'date_joined': user.date_joined,
     })
 
+@query_budget(0)
 @api_view(['GET'])
+@authentication_classes([JWTStatelessUserAuthentication])
 @permission_classes([IsAuthenticated])
 def protected_test(request):
     """Test endpoint to verify JWT authentication is working"""
+    # Only echoes claims, so the user is built from the token without a query
     return Response({
         'message': 'Hello, authenticated user!',
         'user': request.user.username,
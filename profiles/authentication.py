@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .tokens import CachedBlacklistRefreshToken
+
+USER_CACHE_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def request_access_token(request, authenticator=None):
+    """
+    The validated access token of ``request``, or None without a Bearer
+    token; raises InvalidToken for a bad one. It is decoded once per request
+    and shared by the replica routing middleware and DRF authentication.
+    """
+    # DRF's Request wraps the HttpRequest the middleware saw
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_access_token'):
+        authenticator = authenticator or CachedJWTAuthentication()
+        header = authenticator.get_header(request)
+        raw_token = header and authenticator.get_raw_token(header)
+        try:
+            request._access_token = authenticator.get_validated_token(raw_token) if raw_token else None
+        except InvalidToken as error:
+            request._access_token = error
+    if isinstance(request._access_token, InvalidToken):
+        raise request._access_token
+    return request._access_token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds instead of querying on every request.
+    Saving or deleting a user drops its entry (see signals.py), so
+    deactivation and password changes take effect immediately.
+    """
+
+    def authenticate(self, request):
+        validated_token = request_access_token(request, self)
+        if validated_token is None:
+            return None
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Runs the active/revocation checks before anything is cached
+            user = super().get_user(validated_token)
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+            return user
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
+
+
+def tokens_for_user(user):
+    """
+    Refresh token (and derived access token) carrying the claims that
+    token-only endpoints read, so they can run without loading the user.
+    """
+    refresh = CachedBlacklistRefreshToken.for_user(user)
+    refresh['username'] = user.get_username()
+    return refresh
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return tokens_for_user(user)
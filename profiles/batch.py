@@ -0,0 +1,195 @@
+"""
+Batched API requests.
+
+``POST /api/batch/`` takes a JSON list of sub-requests::
+
+    [{"method": "GET", "path": "/api/auth/user/"},
+     {"method": "PATCH", "path": "/api/skills/3/", "body": {"name": "Go"},
+      "headers": {"If-Match": "..."}}]
+
+and answers with their ``{"status", "headers", "body"}`` in the same order.
+The batch is authenticated once; each sub-request is resolved against the
+URL configuration and dispatched in-process to the regular view with that
+user, on the same thread and database connection. Sub-requests run one
+after another, each in its own transaction as usual, so a failing one does
+not undo the ones before it. They keep their own query budgets, log lines
+and replica routing. An exception raised by one answers that sub-request
+alone, with a 404 for ``Http404`` and a 500 otherwise.
+"""
+import copy
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.http import Http404, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .instrumentation import current_metrics, measure_request, report
+from .routing import (
+    SAFE_METHODS,
+    pin_to_primary,
+    pinned_to_primary,
+    read_from_replica,
+    replica_configured,
+    replica_eligible,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+# Headers of the batch request that would wrongly apply to every sub-request
+PER_REQUEST_HEADERS = ('HTTP_IF_', 'HTTP_RANGE', 'HTTP_CONTENT_')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=BATCH_METHODS, default='GET')
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('method'), str):
+            data = {**data, 'method': data['method'].upper()}
+        return super().to_internal_value(data)
+
+    def validate_path(self, value):
+        url = urlsplit(value)
+        if url.scheme or url.netloc or not url.path.startswith('/'):
+            raise serializers.ValidationError('Expected an absolute path on this server.')
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            # Dispatched anyway, so the client gets the usual 404 in place
+            return value
+        if getattr(match.func, 'cls', None) is BatchView:
+            raise serializers.ValidationError('Batches cannot be nested.')
+        return value
+
+
+def build_subrequest(request, method, path, body=None, headers=None):
+    """Copy of the Django ``request`` addressed to ``path`` with its own method, body and headers"""
+    url = urlsplit(path)
+    payload = b'' if body is None else json.dumps(body).encode()
+    meta = {
+        key: value for key, value in request.META.items()
+        if not key.startswith(PER_REQUEST_HEADERS)
+    }
+    meta.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+    })
+    for name, value in (headers or {}).items():
+        meta['HTTP_' + name.upper().replace('-', '_')] = value
+
+    sub = copy.copy(request)
+    # Drop what the original request cached from its own body and headers
+    for attr in ('GET', 'POST', 'FILES', 'headers', '_body', '_post', '_files', 'resolver_match'):
+        sub.__dict__.pop(attr, None)
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.META = meta
+    sub.GET = QueryDict(url.query)
+    sub._stream = io.BytesIO(payload)
+    sub._read_started = False
+    return sub
+
+
+def response_body(method, response):
+    """The sub-response's data, without a render and re-parse round trip for DRF responses"""
+    if method == 'HEAD':
+        return None
+    if hasattr(response, 'data') and not response.is_rendered:
+        return response.data
+    if response.streaming:
+        return None
+    # Template responses are only rendered by the handler we bypass
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    content = response.content
+    if not content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content)
+    return content.decode(response.charset, errors='replace')
+
+
+class BatchView(APIView):
+    """
+    Run a list of API requests as the authenticated user in one round trip,
+    returning their responses in order (see the module docstring).
+    """
+    permission_classes = [IsAuthenticated]
+    max_requests = 20
+    # Sub-requests pin the client to the primary themselves, only if they write
+    pins_primary_on_write = False
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of requests.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_requests:
+            return Response(
+                {'detail': f'At most {self.max_requests} requests per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = SubRequestSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([self.dispatch_subrequest(request, item) for item in serializer.validated_data])
+
+    def dispatch_subrequest(self, request, item):
+        sub = build_subrequest(request._request, item['method'], item['path'], item.get('body'), item['headers'])
+        # Authenticated already: the views reuse this user and token
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        outer = current_metrics()
+        with measure_request() as metrics:
+            response = self.call_view(sub, metrics)
+        if outer is not None:
+            outer.serialize_time += metrics.serialize_time
+        report(sub, response, metrics)
+        if sub.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+            pin_to_primary(request.user.pk)
+        return {
+            'status': response.status_code,
+            'headers': {
+                name: value for name, value in response.items()
+                if name not in ('Content-Type', 'Content-Length', 'Vary', 'Allow')
+            },
+            'body': response_body(sub.method, response),
+        }
+
+    def call_view(self, sub, metrics):
+        try:
+            return self.run_view(sub, metrics)
+        except Http404:
+            # Plain Django views signal a miss the way the handler expects
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception:
+            logger.exception('Batched %s %s failed', sub.method, sub.get_full_path())
+            return Response(
+                {'detail': 'A server error occurred.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def run_view(self, sub, metrics):
+        try:
+            match = resolve(sub.path_info, urlconf=getattr(sub, 'urlconf', None))
+        except Resolver404:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        sub.resolver_match = match
+        # The async read views authenticate from the headers themselves
+        view = getattr(match.func, 'sync_view', match.func)
+        metrics.endpoint = match.view_name or sub.path
+        metrics.budget = getattr(view, 'query_budget', None)
+        if replica_eligible(sub.method, view) and not pinned_to_primary(self.request.user.pk):
+            with read_from_replica():
+                return view(sub, *match.args, **match.kwargs)
+        return view(sub, *match.args, **match.kwargs)
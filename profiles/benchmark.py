@@ -0,0 +1,152 @@
+"""
+In-process API benchmark. Each scenario is one endpoint called through
+Django's test client, so numbers include middleware, authentication,
+serialization and rendering but no network. ``run_benchmark`` returns a
+JSON-serializable report that can be stored and compared between runs.
+"""
+import datetime
+import platform
+import statistics
+import time
+from contextlib import ExitStack
+
+import django
+from django.core.cache import cache
+from django.db import connection, connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .models import Certification, EmployeeProfile, Education, Project, Skill
+from .synthetic import SKILLS
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(samples, percent):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+def build_scenarios(username, password, sample_size=50):
+    """``(name, method, url_factory, data_factory)`` for every benchmarked endpoint"""
+    ids = {
+        model: list(model.objects.order_by('id').values_list('id', flat=True)[:sample_size])
+        for model in (EmployeeProfile, Skill, Education, Certification, Project)
+    }
+
+    def rotating(model, name):
+        values = ids[model] or [0]
+        return lambda i: reverse(name, args=[values[i % len(values)]])
+
+    def fixed(name, query=''):
+        url = reverse(name) + query
+        return lambda i: url
+
+    skill_query = lambda i: reverse('employeeprofile-search') + f'?q={SKILLS[i % len(SKILLS)]}'
+    match_query = lambda i: reverse('employeeprofile-match') + f'?skills={SKILLS[i % len(SKILLS)]}:expert,{SKILLS[(i + 1) % len(SKILLS)]}'
+    credentials = lambda i: {'username': username, 'password': password}
+
+    scenarios = [
+        ('profiles.list', 'get', fixed('employeeprofile-list'), None),
+        ('profiles.list.cursor', 'get', fixed('employeeprofile-list', '?pagination=cursor'), None),
+        ('profiles.detail', 'get', rotating(EmployeeProfile, 'employeeprofile-detail'), None),
+        ('profiles.my_profile', 'get', fixed('employeeprofile-my-profile'), None),
+        ('profiles.search', 'get', skill_query, None),
+        ('profiles.match', 'get', match_query, None),
+        ('profiles.skills', 'get', rotating(EmployeeProfile, 'profile-skills'), None),
+        ('profiles.projects', 'get', rotating(EmployeeProfile, 'profile-projects'), None),
+        ('certifications.expiring', 'get', fixed('certification-expiring', '?days=365'), None),
+        ('auth.login', 'post', fixed('token_obtain_pair'), credentials),
+        ('auth.user', 'get', fixed('user_profile'), None),
+    ]
+    for model, basename in ((Skill, 'skill'), (Education, 'education'), (Certification, 'certification'), (Project, 'project')):
+        scenarios.append((f'{basename}.list', 'get', fixed(f'{basename}-list'), None))
+        scenarios.append((f'{basename}.detail', 'get', rotating(model, f'{basename}-detail'), None))
+    return scenarios
+
+
+def run_scenario(client, method, url_factory, data_factory, iterations, warmup, cold_cache):
+    counter = QueryCounter()
+    timings, queries, statuses = [], [], {}
+    for i in range(warmup + iterations):
+        if cold_cache:
+            cache.clear()
+        url = url_factory(i)
+        data = data_factory(i) if data_factory else None
+        counter.count = 0
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data, format='json') if data is not None else getattr(client, method)(url)
+            elapsed = time.perf_counter() - started
+        if i < warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(counter.count)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    total = sum(timings) / 1000
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+        'requests_per_second': round(iterations / total, 1) if total else None,
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def run_benchmark(username, password, iterations=50, warmup=5, cold_cache=False, only=None, host='localhost'):
+    client = APIClient(SERVER_NAME=host)
+    login = client.post(reverse('token_obtain_pair'), {'username': username, 'password': password}, format='json')
+    if login.status_code != 200:
+        raise ValueError(f'Could not log in as {username!r}: {login.status_code} {login.content[:200]!r}')
+    tokens = login.json()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+
+    scenarios = build_scenarios(username, password)
+    scenarios.append(('auth.refresh', 'post', lambda i: reverse('token_refresh'), lambda i: {'refresh': tokens['refresh']}))
+    results = {}
+    for name, method, url_factory, data_factory in scenarios:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = run_scenario(client, method, url_factory, data_factory, iterations, warmup, cold_cache)
+
+    return {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cold_cache': cold_cache,
+        },
+        'dataset': {
+            'profiles': EmployeeProfile.objects.count(),
+            'skills': Skill.objects.count(),
+            'projects': Project.objects.count(),
+            'education': Education.objects.count(),
+            'certifications': Certification.objects.count(),
+        },
+        'scenarios': results,
+    }
+
+
+def compare(baseline, report, metric='p50_ms'):
+    """``{scenario: current / baseline}`` for scenarios present in both reports"""
+    ratios = {}
+    for name, result in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous and previous.get(metric):
+            ratios[name] = round(result[metric] / previous[metric], 3)
+    return ratios
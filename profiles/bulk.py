@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import EmployeeProfile
+from .search import SECTION_COLUMNS
+from .signals import batched_section_changes, mark_profiles_changed, moved_row_counts, section_counts
+
+
+class OwnedProfileField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves profile ids against the requesting user's profiles, loaded once
+    for the whole batch instead of one lookup per item.
+    """
+    default_error_messages = {
+        'not_owned': 'You can only modify your own profile.',
+    }
+
+    def __init__(self, profiles, **kwargs):
+        self.profiles = profiles
+        super().__init__(queryset=EmployeeProfile.objects.none(), **kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.profiles[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('not_owned')
+
+
+class BulkSectionMixin:
+    """
+    ``/bulk/`` route for CV section viewsets: POST a list of new rows, PATCH a
+    list of partial rows carrying their ``id``, or DELETE a list of ids. The
+    batch is all-or-nothing: any invalid item rejects the whole request with
+    a 400 whose ``errors`` list lines up with the submitted items.
+    """
+    bulk_max_items = 500
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'detail': f'At most {self.bulk_max_items} items per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request, items)
+        if request.method == 'PATCH':
+            return self.bulk_update(request, items)
+        return self.bulk_create(request, items)
+
+    def get_owned_profiles(self, items):
+        profile_ids = set()
+        for item in items:
+            try:
+                profile_ids.add(int(item['profile']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return EmployeeProfile.objects.filter(owner=self.request.user, id__in=profile_ids).in_bulk()
+
+    def get_owned_rows(self, ids):
+        model = self.get_queryset().model
+        return model.objects.filter(profile__owner=self.request.user, id__in=ids).in_bulk()
+
+    def validate_items(self, items, instances=None):
+        """Validate every item, returning (validated_data list, errors list)"""
+        profiles = self.get_owned_profiles(items)
+        validated, errors = [], []
+        for index, item in enumerate(items):
+            instance = instances[index] if instances else None
+            serializer = self.get_serializer(instance, data=item, partial=instance is not None)
+            serializer.fields['profile'] = OwnedProfileField(profiles)
+            if serializer.is_valid():
+                validated.append(serializer.validated_data)
+                errors.append({})
+            else:
+                validated.append(None)
+                errors.append(serializer.errors)
+        return validated, errors
+
+    def bulk_create(self, request, items):
+        validated, errors = self.validate_items(items)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        rows = [model(**data) for data in validated]
+        with transaction.atomic(), batched_section_changes():
+            model.objects.bulk_create(rows)
+            counts = section_counts(model, [row.profile_id for row in rows])
+            mark_profiles_changed(counts.keys(), counts, columns=[SECTION_COLUMNS[model]])
+        return Response(self.get_serializer(rows, many=True).data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, items):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        rows = self.get_owned_rows([pk for pk in ids if pk is not None])
+        instances, missing = [], {}
+        for index, pk in enumerate(ids):
+            instance = rows.get(pk) if isinstance(pk, int) else None
+            instances.append(instance)
+            if instance is None:
+                missing[index] = {'id': ['No such row in your profile.']}
+        if missing:
+            errors = [missing.get(index, {}) for index in range(len(items))]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        validated, errors = self.validate_items(items, instances)
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Moving a row to another profile changes both documents
+        profile_ids = {instance.profile_id for instance in instances}
+        changed_fields = {'updated_at'}
+        now = timezone.now()
+        for instance, data in zip(instances, validated):
+            for attr, value in data.items():
+                setattr(instance, attr, value)
+            instance.updated_at = now
+            changed_fields.update(data)
+
+        model = self.get_queryset().model
+        profile_ids.update(instance.profile_id for instance in instances)
+        with transaction.atomic(), batched_section_changes():
+            model.objects.bulk_update(instances, sorted(changed_fields))
+            mark_profiles_changed(profile_ids, moved_row_counts(model, instances), columns=[SECTION_COLUMNS[model]])
+        for instance in instances:
+            instance._loaded_profile_id = instance.profile_id
+        return Response(self.get_serializer(instances, many=True).data)
+
+    def bulk_destroy(self, request, items):
+        rows = self.get_owned_rows([pk for pk in items if isinstance(pk, int)])
+        errors = [{} if pk in rows else {'id': ['No such row in your profile.']} for pk in items]
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        with transaction.atomic(), batched_section_changes():
+            model.objects.filter(id__in=rows).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,86 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+
+from .routing import read_from_primary
+
+# Rendered detail documents live until their profile's version changes;
+# the timeout only bounds how long unread entries occupy the cache.
+DETAIL_CACHE_TIMEOUT = getattr(settings, 'PROFILE_DETAIL_CACHE_TIMEOUT', 60 * 60)
+
+# Backends whose entries only the writing worker process can see
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Whether every worker process reads the same entries from cache ``alias``"""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def _version_key(profile_id):
+    return f'profiles:detail:version:{profile_id}'
+
+
+def _payload_key(profile_id, variant):
+    return f'profiles:detail:{profile_id}:{variant}'
+
+
+def bump_profile_version(profile_id):
+    """Invalidate every cached rendering of the profile"""
+    # Versions are random tokens rather than counters so an evicted version
+    # key can never be re-created with a value a stale payload still carries.
+    cache.set(_version_key(profile_id), uuid.uuid4().hex, None)
+
+
+def get_or_render_detail(profile_id, render, variant=''):
+    """
+    Return the cached detail document for ``profile_id``, calling ``render()``
+    to build and store it on a miss. A hit costs a single ``get_many``.
+    """
+    version_key = _version_key(profile_id)
+    payload_key = _payload_key(profile_id, variant)
+    found = cache.get_many([version_key, payload_key])
+    version, entry = found.get(version_key), found.get(payload_key)
+    if _is_current(version, entry):
+        return entry[1]
+
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key)
+    # The version is read before rendering, so a write racing with the
+    # render leaves this entry tagged with an already-superseded version.
+    # Shared entries are rendered from the primary: a lagging replica could
+    # otherwise store old rows under the current version.
+    with read_from_primary():
+        data = render()
+    cache.set(payload_key, (version, data), DETAIL_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_or_render_detail(profile_id, arender, variant=''):
+    """Async counterpart of get_or_render_detail; ``arender`` is a coroutine function"""
+    version_key = _version_key(profile_id)
+    payload_key = _payload_key(profile_id, variant)
+    found = await cache.aget_many([version_key, payload_key])
+    version, entry = found.get(version_key), found.get(payload_key)
+    if _is_current(version, entry):
+        return entry[1]
+
+    if version is None:
+        version = uuid.uuid4().hex
+        if not await cache.aadd(version_key, version, None):
+            version = await cache.aget(version_key)
+    # Rendered from the primary, as in get_or_render_detail
+    with read_from_primary():
+        data = await arender()
+    await cache.aset(payload_key, (version, data), DETAIL_CACHE_TIMEOUT)
+    return data
+
+
+def _is_current(version, entry):
+    return version is not None and entry is not None and entry[0] == version
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from . import routing
+from .cache import is_shared
+
+
+@register(Tags.caches)
+def check_replica_pins_are_shared(app_configs, **kwargs):
+    """
+    A client that wrote is pinned to the primary through the cache (see
+    routing.py); with a per-process cache the next request, served by
+    another worker, would read its stale rows from the replica.
+    """
+    if not routing.replica_configured() or is_shared():
+        return []
+    return [Error(
+        f"The '{routing.REPLICA_ALIAS}' database needs a cache shared by every worker process.",
+        hint=(
+            f"Read-your-writes pins are kept in the '{settings.CACHES['default']['BACKEND']}' cache, which only "
+            'the worker that wrote can see. Set PIXICV_CACHE_BACKEND to a shared backend such as Redis.'
+        ),
+        id='profiles.E001',
+    )]
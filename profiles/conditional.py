@@ -0,0 +1,86 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import EmployeeProfile
+
+
+def make_etag(request, last_modified):
+    """Weak validator for the representation at this URL as of ``last_modified``"""
+    # The full path is part of the tag because query parameters change the body
+    raw = f'{request.get_full_path()}:{last_modified.timestamp()}'
+    return 'W/"%s"' % hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def evaluate_conditions(request, last_modified):
+    """``(etag, timestamp, response)`` where response is a 304 if the client is current"""
+    etag = make_etag(request, last_modified)
+    timestamp = int(last_modified.timestamp())
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag, timestamp):
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(timestamp))
+    return response
+
+
+def conditional_get(last_modified_func):
+    """
+    Answer GET/HEAD with 304 Not Modified when the client's If-None-Match or
+    If-Modified-Since still matches, before the wrapped handler (and its
+    serializer) runs. ``last_modified_func(view, request, *args, **kwargs)``
+    should be a cheap query returning a datetime, or None to skip validation.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return handler(self, request, *args, **kwargs)
+            last_modified = last_modified_func(self, request, *args, **kwargs)
+            if last_modified is None:
+                return handler(self, request, *args, **kwargs)
+
+            etag, timestamp, response = evaluate_conditions(request, last_modified)
+            if response is None:
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return set_validators(response, etag, timestamp)
+        return wrapper
+    return decorator
+
+
+def object_last_modified(view, request, *args, **kwargs):
+    """``updated_at`` of the object a detail route points at"""
+    lookup = kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+    try:
+        return (
+            view.queryset.model._default_manager
+            .filter(**{view.lookup_field: lookup})
+            .values_list('updated_at', flat=True)
+            .first()
+        )
+    except (TypeError, ValueError):
+        # Let the handler produce its usual 404
+        return None
+
+
+def profile_last_modified(view, request, profile_id, *args, **kwargs):
+    """``updated_at`` of the profile named by a ``profile_id`` URL kwarg"""
+    return EmployeeProfile.objects.filter(id=profile_id).values_list('updated_at', flat=True).first()
+
+
+def own_profile_last_modified(view, request, *args, **kwargs):
+    """``updated_at`` of the requesting user's profile"""
+    return EmployeeProfile.objects.filter(owner=request.user).values_list('updated_at', flat=True).first()
+
+
+class ConditionalRetrieveMixin:
+    """Conditional GET for the ``retrieve`` action of a model viewset"""
+
+    @conditional_get(object_last_modified)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,88 @@
+"""
+Streaming export of every profile with all of its sections.
+
+Profiles are read with ``iterator(chunk_size=...)``, which runs the section
+prefetches once per chunk, so memory stays flat however many profiles are
+exported. Each chunk is serialized with the detail serializer and written out
+as NDJSON (one CV document per line) or CSV (one row per profile, sections as
+embedded JSON).
+"""
+import csv
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import SECTIONS, EmployeeProfile
+from .serializers import EmployeeProfileDetailSerializer
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_CHUNK_SIZE = 500
+CSV_COLUMNS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'position', 'bio', 'joined_at',
+) + SECTIONS
+
+
+def export_queryset():
+    return EmployeeProfile.objects.select_related('owner').with_sections().order_by('id')
+
+
+def iter_documents(chunk_size=EXPORT_CHUNK_SIZE, context=None):
+    """Yield serialized profile documents, loading ``chunk_size`` profiles at a time"""
+    chunk = []
+    for profile in export_queryset().iterator(chunk_size=chunk_size):
+        chunk.append(profile)
+        if len(chunk) == chunk_size:
+            yield from EmployeeProfileDetailSerializer(chunk, many=True, context=context or {}).data
+            chunk = []
+    if chunk:
+        yield from EmployeeProfileDetailSerializer(chunk, many=True, context=context or {}).data
+
+
+def to_json(value):
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_ndjson(documents):
+    for document in documents:
+        yield to_json(document) + '\n'
+
+
+class Echo:
+    """File-like object handing each written CSV row straight back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_row(document):
+    owner = document.get('owner') or {}
+    row = {
+        'id': document['id'],
+        'username': owner.get('username'),
+        'email': owner.get('email'),
+        'first_name': owner.get('first_name'),
+        'last_name': owner.get('last_name'),
+        'position': document['position'],
+        'bio': document['bio'],
+        'joined_at': document['joined_at'],
+    }
+    for name in SECTIONS:
+        row[name] = to_json(document[name])
+    return [row[column] for column in CSV_COLUMNS]
+
+
+def iter_csv(documents):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for document in documents:
+        yield writer.writerow(csv_row(document))
+
+
+def iter_export(export_format, chunk_size=EXPORT_CHUNK_SIZE, context=None):
+    documents = iter_documents(chunk_size=chunk_size, context=context)
+    if export_format == 'csv':
+        return iter_csv(documents)
+    return iter_ndjson(documents)
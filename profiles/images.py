@@ -0,0 +1,140 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Project
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height, crop). Cropped variants are exactly that size,
+# the others fit inside the box keeping their aspect ratio.
+IMAGE_VARIANTS = getattr(settings, 'PROJECT_IMAGE_VARIANTS', {
+    'thumb': (320, 240, True),
+    'medium': (1024, 768, False),
+})
+WEBP_QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PROJECT_IMAGE_WORKERS', 2),
+                thread_name_prefix='project-images',
+            )
+        return _executor
+
+
+def variant_path(source_name, variant):
+    # The full blob name: the same content stored under two extensions is
+    # two blobs with their own lifetimes, so their variants must not collide
+    return f'projects/variants/{os.path.basename(source_name)}_{variant}.webp'
+
+
+def render_variant(image, width, height, crop):
+    if crop:
+        resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((width, height), Image.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def write_variant(path, data):
+    """
+    Store ``data`` under exactly ``path``. The file is written next to its
+    destination and renamed over it, so two jobs rendering the same variant
+    leave one complete file rather than a suffixed duplicate.
+    """
+    full_path = default_storage.path(path)
+    directory = os.path.dirname(full_path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as temp:
+            temp.write(data)
+        os.replace(temp_path, full_path)
+        if default_storage.file_permissions_mode is not None:
+            os.chmod(full_path, default_storage.file_permissions_mode)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def process_project_image(project_id):
+    """
+    Generate the WebP variants of a project's image and record them in
+    ``image_variants``. They are deleted with their source image, once no
+    project references it (see ``delete_variants``).
+    """
+    project = Project.objects.filter(pk=project_id).only('id', 'profile_id', 'image', 'image_variants').first()
+    if project is None:
+        return
+    source = project.image.name if project.image else ''
+    previous = project.image_variants or {}
+    if previous.get('source', '') == source:
+        return
+
+    variants = {}
+    if source:
+        with default_storage.open(source) as handle, Image.open(handle) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for name, (width, height, crop) in IMAGE_VARIANTS.items():
+                path = variant_path(source, name)
+                # Identical uploads share a source name, so their variants
+                # are rendered once
+                if not default_storage.exists(path):
+                    write_variant(path, render_variant(image, width, height, crop))
+                variants[name] = path
+
+    # Conditional update: a newer upload that raced with this job wins.
+    # update() skips auto_now, and the project's ETag is keyed on updated_at
+    updated = Project.objects.filter(pk=project_id, image=source).update(
+        image_variants={**variants, 'source': source}, updated_at=timezone.now()
+    )
+    if updated:
+        from .signals import mark_profiles_changed
+        mark_profiles_changed([project.profile_id], columns=())
+
+
+def delete_variants(source_name):
+    for name in IMAGE_VARIANTS:
+        default_storage.delete(variant_path(source_name, name))
+
+
+def _run(project_id):
+    close_old_connections()
+    try:
+        process_project_image(project_id)
+    except Exception:
+        logger.exception('Image variants failed for project %s', project_id)
+    finally:
+        close_old_connections()
+
+
+def needs_processing(project):
+    source = project.image.name if project.image else ''
+    return (project.image_variants or {}).get('source', '') != source
+
+
+def schedule_project_image(project):
+    """Queue variant generation for after the current transaction commits"""
+    project_id = project.pk
+    transaction.on_commit(lambda: get_executor().submit(_run, project_id))
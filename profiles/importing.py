@@ -0,0 +1,150 @@
+"""
+Bulk import of users, profiles and CV sections from JSONL.
+
+Each line is one CV document, either flat or in the ``export_profiles``
+shape (user fields nested under ``owner``)::
+
+    {"username": "jdoe", "email": "jdoe@example.com", "password": "...",
+     "position": "Backend Engineer", "bio": "...",
+     "skills": [{"name": "Python", "prificiency": "expert"}], "education": [...],
+     "certifications": [...], "projects": [...]}
+
+Rows are written with ``bulk_create``, so no model signals fire: the
+profile, its search index rows and its skill-index entries are maintained
+here instead. Project images are not imported (they are uploaded through
+the project endpoints, as with the document API).
+"""
+import json
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework import serializers
+
+from .matching import skill_index
+from .models import COUNTER_FIELDS, EmployeeProfile
+from .search import reindex_profiles
+from .serializers import (
+    CertificationItemSerializer,
+    EducationItemSerializer,
+    ProjectItemSerializer,
+    SkillItemSerializer,
+)
+
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name')
+DEFAULT_POSITION = 'New Employee'
+SECTION_SERIALIZERS = {
+    'skills': SkillItemSerializer,
+    'education': EducationItemSerializer,
+    'certifications': CertificationItemSerializer,
+    'projects': ProjectItemSerializer,
+}
+
+
+class ImportUserSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150)
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True, default='')
+    password = serializers.CharField(required=False, allow_null=True, default=None, trim_whitespace=False)
+    position = serializers.CharField(max_length=100, required=False, default=DEFAULT_POSITION)
+    bio = serializers.CharField(required=False, allow_blank=True, allow_null=True, default=None)
+
+
+def init_worker():
+    # Spawned (non-forked) hashing workers start without Django configured
+    if not apps.ready:
+        django.setup()
+
+
+def read_records(lines, start_line=1):
+    """Yield ``(line_number, record, error)`` for each non-blank line from ``start_line``"""
+    for line_number, line in enumerate(lines, start=1):
+        if line_number < start_line or not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f'invalid JSON: {exc}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'expected a JSON object'
+            continue
+        yield line_number, record, None
+
+
+def validate_record(record):
+    """Split ``record`` into user, profile and section data; raises ValidationError"""
+    flat = {**record, **(record.get('owner') or {})}
+    serializer = ImportUserSerializer(data=flat)
+    serializer.is_valid(raise_exception=True)
+    data = dict(serializer.validated_data)
+    sections = {}
+    for name, serializer_class in SECTION_SERIALIZERS.items():
+        items = serializer_class(data=record.get(name) or [], many=True)
+        if not items.is_valid():
+            raise serializers.ValidationError({name: items.errors})
+        # Ids from another database are never reused
+        sections[name] = [{k: v for k, v in item.items() if k != 'id'} for item in items.validated_data]
+    return {
+        'user': {field: data[field] for field in USER_FIELDS},
+        'password': data['password'],
+        'profile': {'position': data['position'], 'bio': data['bio']},
+        'sections': sections,
+    }
+
+
+def hash_passwords(passwords, pool=None):
+    """Hash ``passwords`` (None gives an unusable password), in ``pool`` when given"""
+    usable = [password for password in passwords if password is not None]
+    if pool is not None and usable:
+        hashed = iter(pool.map(make_password, usable, chunksize=max(1, len(usable) // 32)))
+    else:
+        hashed = iter(make_password(password) for password in usable)
+    return [next(hashed) if password is not None else make_password(None) for password in passwords]
+
+
+def existing_usernames(entries):
+    names = [entry['user']['username'] for entry in entries]
+    return set(User.objects.filter(username__in=names).values_list('username', flat=True))
+
+
+def insert_chunk(entries, pool=None):
+    """
+    Insert ``entries`` (validated records, unique usernames not yet in the
+    database) in one transaction and return the new profile ids.
+    """
+    passwords = hash_passwords([entry['password'] for entry in entries], pool)
+    with transaction.atomic():
+        User.objects.bulk_create([
+            User(password=password, **entry['user']) for entry, password in zip(entries, passwords)
+        ])
+        # Fetched back by natural key: not every backend returns bulk-inserted ids
+        user_ids = dict(User.objects.filter(
+            username__in=[entry['user']['username'] for entry in entries]
+        ).values_list('username', 'id'))
+        # Sections are known up front, so the counters are written with the row
+        EmployeeProfile.objects.bulk_create([
+            EmployeeProfile(
+                owner_id=user_ids[entry['user']['username']],
+                **entry['profile'],
+                **{field: len(entry['sections'][name]) for name, field in COUNTER_FIELDS.items()},
+            )
+            for entry in entries
+        ])
+        profile_ids = dict(EmployeeProfile.objects.filter(
+            owner_id__in=user_ids.values()
+        ).values_list('owner_id', 'id'))
+        for name in SECTION_SERIALIZERS:
+            model = EmployeeProfile._meta.get_field(name).related_model
+            model.objects.bulk_create([
+                model(profile_id=profile_ids[user_ids[entry['user']['username']]], **item)
+                for entry in entries for item in entry['sections'][name]
+            ])
+        # Side effects the skipped post_save signals would have had
+        new_ids = list(profile_ids.values())
+        reindex_profiles(new_ids)
+        transaction.on_commit(lambda: skill_index.refresh_profiles(new_ids))
+    return new_ids
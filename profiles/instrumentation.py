@@ -0,0 +1,271 @@
+"""
+Per-request performance instrumentation.
+
+RequestMetricsMiddleware counts SQL queries and database time on every
+alias, times serialization and response rendering, and reports them in a
+``Server-Timing`` header plus one JSON log line per request on the
+``profiles.requests`` logger. Views declare query budgets, either per action
+with ``query_budgets`` on InstrumentedViewMixin views or with
+``@query_budget(n)`` on function views. Going over budget logs a warning,
+and fails the request outright under BudgetTestRunner so regressions break
+the tests.
+"""
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger('profiles.requests')
+
+# Turned on by BudgetTestRunner
+STRICT_BUDGETS = False
+
+_current = contextvars.ContextVar('profiles_request_metrics', default=None)
+_timed_serializers = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self.endpoint = None
+        self.serializer = None
+        self.budget = None
+        self._serializing = False
+        self._render_started = None
+        self._paused = False
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        if self._paused:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @contextmanager
+    def untracked(self):
+        """Leave diagnostic queries (e.g. EXPLAIN) out of the request's numbers"""
+        self._paused = True
+        try:
+            yield
+        finally:
+            self._paused = False
+
+    def rendered(self, response):
+        self.render_time += time.perf_counter() - self._render_started
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'serializer': self.serializer,
+            'queries': self.queries,
+            'query_budget': self.budget,
+            'db_ms': round(self.db_time * 1000, 2),
+            'serialize_ms': round(self.serialize_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'total_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def current_metrics():
+    return _current.get()
+
+
+def _track_queries(metrics):
+    """Count the queries on this thread's connections until the returned stack is closed"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+    return stack
+
+
+@contextmanager
+def measure_request():
+    """
+    Collect the metrics of the code in the block (one request, or one
+    sub-request of a batch) in a fresh RequestMetrics. Queries still count
+    towards any enclosing measurement as well.
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        with _track_queries(metrics):
+            yield metrics
+    finally:
+        _current.reset(token)
+        metrics.total_time = time.perf_counter() - metrics.started
+
+
+@asynccontextmanager
+async def ameasure_request():
+    """
+    measure_request() for async code. Its queries run on the thread that
+    sync_to_async() hands the request's database work to, whose connections
+    are not the event loop's, so the query counters are installed there.
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        stack = await sync_to_async(_track_queries)(metrics)
+        try:
+            yield metrics
+        finally:
+            await sync_to_async(stack.close)()
+    finally:
+        _current.reset(token)
+        metrics.total_time = time.perf_counter() - metrics.started
+
+
+def query_budget(limit):
+    """Declare the most SQL queries a function view may run per request"""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+class TimedRepresentationMixin:
+    """Adds the time spent in the outermost ``to_representation`` to the request metrics"""
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics._serializing:
+            return super().to_representation(instance)
+        metrics._serializing = True
+        metrics.serializer = metrics.serializer or type(self).__name__
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serialize_time += time.perf_counter() - started
+            metrics._serializing = False
+
+
+def timed_serializer(serializer_class):
+    try:
+        return _timed_serializers[serializer_class]
+    except KeyError:
+        timed = type(serializer_class.__name__, (TimedRepresentationMixin, serializer_class), {
+            '__module__': serializer_class.__module__,
+            '__qualname__': serializer_class.__qualname__,
+        })
+        return _timed_serializers.setdefault(serializer_class, timed)
+
+
+class InstrumentedViewMixin:
+    """
+    Times the view's serializers and applies ``query_budgets``, a mapping of
+    action (or lower-case method for plain API views) to maximum queries.
+    ``'<action>:<method>'`` keys override the action's budget for one method.
+    """
+    query_budgets = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = _current.get()
+        if metrics is not None:
+            action = getattr(self, 'action', None) or request.method.lower()
+            metrics.endpoint = f'{type(self).__name__}.{action}'
+            method = request.method.lower()
+            metrics.budget = self.query_budgets.get(f'{action}:{method}', self.query_budgets.get(action))
+
+    def get_serializer(self, *args, **kwargs):
+        # GenericAPIView.get_serializer with the serializer class timed. List
+        # this mixin after mixins that wrap get_serializer, so they see it.
+        serializer_class = timed_serializer(self.get_serializer_class())
+        kwargs.setdefault('context', self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with measure_request() as metrics:
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        async with ameasure_request() as metrics:
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        response['Server-Timing'] = metrics.server_timing()
+        report(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.endpoint = request.resolver_match.view_name or request.path
+            metrics.budget = getattr(view_func, 'query_budget', None)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        metrics = _current.get()
+        if metrics is not None:
+            metrics._render_started = time.perf_counter()
+            response.add_post_render_callback(metrics.rendered)
+        return response
+
+
+def report(request, response, metrics):
+    """Log the request's metrics and enforce its query budget"""
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        **metrics.as_dict(),
+    }
+    logger.info(json.dumps(record))
+    if metrics.budget is not None and metrics.queries > metrics.budget:
+        message = f'{metrics.endpoint} ran {metrics.queries} queries, over its budget of {metrics.budget}'
+        logger.warning(message, extra={'request_metrics': record})
+        if STRICT_BUDGETS:
+            raise QueryBudgetExceeded(message)
+
+
+class BudgetTestRunner(DiscoverRunner):
+    """Test runner under which exceeding a query budget fails the request"""
+
+    def setup_test_environment(self, **kwargs):
+        global STRICT_BUDGETS
+        super().setup_test_environment(**kwargs)
+        STRICT_BUDGETS = True
+
+    def teardown_test_environment(self, **kwargs):
+        global STRICT_BUDGETS
+        STRICT_BUDGETS = False
+        super().teardown_test_environment(**kwargs)
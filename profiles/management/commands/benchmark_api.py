@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiles.benchmark import compare, run_benchmark
+from profiles.synthetic import seed_username
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the API in-process and print a JSON report with p50/p95/p99 latency, '
+        'queries per request and throughput per endpoint. Seed data with seed_profiles first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default=seed_username(0))
+        parser.add_argument('--password', default='benchmark-password')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--only', nargs='*', help='Scenario name prefixes, e.g. profiles. auth.login')
+        parser.add_argument('--host', default='localhost', help='Host header; must be in ALLOWED_HOSTS')
+        parser.add_argument('--output', '-o', help='Also write the report to this file')
+        parser.add_argument('--compare', help='Baseline report; adds current/baseline p50 ratios')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive')
+        try:
+            report = run_benchmark(
+                options['username'], options['password'], iterations=options['iterations'],
+                warmup=options['warmup'], cold_cache=options['cold_cache'], only=options['only'],
+                host=options['host'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline:
+                report['p50_vs_baseline'] = compare(json.load(baseline), report)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+        self.stdout.write(output)
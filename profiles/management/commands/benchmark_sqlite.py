@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+ALIAS = 'sqlite_benchmark'
+SEED_ROWS = 10000
+MODES = {
+    # What Django does out of the box
+    'default': {},
+    'production': settings.SQLITE_PRODUCTION_OPTIONS,
+}
+
+
+def open_alias(path, options):
+    if not apps.ready:
+        django.setup()
+    connections.settings[ALIAS] = connections.configure_settings({
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'OPTIONS': dict(options)},
+    })['default']
+    return connections[ALIAS]
+
+
+def writer(path, options, deadline, results):
+    connection = open_alias(path, options)
+    done = failed = 0
+    while time.monotonic() < deadline:
+        try:
+            # Read-then-write, the shape of most of the API's writes
+            with transaction.atomic(using=ALIAS), connection.cursor() as cursor:
+                cursor.execute('SELECT score FROM bench WHERE id = %s', [done % SEED_ROWS + 1])
+                score = cursor.fetchone()[0]
+                cursor.execute('UPDATE bench SET score = %s WHERE id = %s', [score + 1, done % SEED_ROWS + 1])
+                cursor.execute('INSERT INTO bench_log (bench_id, payload) VALUES (%s, %s)', [done % SEED_ROWS + 1, 'x' * 200])
+            done += 1
+        except OperationalError:
+            failed += 1
+    connection.close()
+    results.put(('write', done, failed))
+
+
+def reader(path, options, deadline, results):
+    connection = open_alias(path, options)
+    done = failed = 0
+    while time.monotonic() < deadline:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COUNT(*), SUM(score) FROM bench WHERE id BETWEEN %s AND %s',
+                    [done % SEED_ROWS, done % SEED_ROWS + 200],
+                )
+                cursor.fetchone()
+            done += 1
+        except OperationalError:
+            failed += 1
+    connection.close()
+    results.put(('read', done, failed))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare read and write throughput of concurrent worker processes on a scratch SQLite '
+        "file with Django's default SQLite settings and with SQLITE_PRODUCTION_OPTIONS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per mode')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, {options['duration']:.0f}s per mode"
+        )
+        for mode, sqlite_options in MODES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.seed(path)
+                totals = self.run(path, sqlite_options, options)
+            self.stdout.write(
+                f"{mode:>10}: {totals['read'][0] / options['duration']:9.0f} reads/s "
+                f"({totals['read'][1]} failed), "
+                f"{totals['write'][0] / options['duration']:7.0f} writes/s "
+                f"({totals['write'][1]} failed)"
+            )
+
+    def seed(self, path):
+        with sqlite3.connect(path) as db:
+            db.execute('CREATE TABLE bench (id INTEGER PRIMARY KEY, score INTEGER NOT NULL)')
+            db.execute('CREATE TABLE bench_log (id INTEGER PRIMARY KEY, bench_id INTEGER, payload TEXT)')
+            db.executemany('INSERT INTO bench (score) VALUES (?)', [(0,)] * SEED_ROWS)
+        db.close()
+
+    def run(self, path, sqlite_options, options):
+        # Separate processes, like separate WSGI workers, each with its own connection
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        connections.close_all()
+        deadline = time.monotonic() + options['duration']
+        workers = [
+            context.Process(target=target, args=(path, sqlite_options, deadline, results))
+            for target, count in ((reader, options['readers']), (writer, options['writers']))
+            for _ in range(count)
+        ]
+        for process in workers:
+            process.start()
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in workers:
+            kind, done, failed = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += failed
+        for process in workers:
+            process.join()
+        return totals
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from profiles.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream every profile with all sections as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--output', '-o', default='-', help='File to write, "-" for stdout')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        parts = iter_export(options['format'], chunk_size=options['chunk_size'])
+        output = options['output']
+        if output == '-':
+            for part in parts:
+                self.stdout.write(part, ending='')
+            return
+        with open(output, 'w', encoding='utf-8', newline='') as stream:
+            stream.writelines(parts)
+        self.stderr.write(self.style.SUCCESS(f'Exported profiles to {output}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from profiles.images import needs_processing, process_project_image
+from profiles.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Generate missing or outdated WebP variants for project images'
+
+    def handle(self, *args, **options):
+        processed = 0
+        projects = Project.objects.only('id', 'image', 'image_variants').iterator(chunk_size=500)
+        for project in projects:
+            if needs_processing(project):
+                process_project_image(project.pk)
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} project images'))
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from profiles.importing import existing_usernames, init_worker, insert_chunk, read_records, validate_record
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import users, profiles and CV sections from JSONL. Each chunk is committed on '
+        'its own and existing usernames are skipped, so an interrupted import can simply be re-run '
+        '(or resumed with --start-line).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL file, "-" for stdin')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes hashing passwords; 0 hashes in this process'
+        )
+        parser.add_argument('--start-line', type=int, default=1, help='First line to read (1-based)')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        self.pool = None
+        if options['workers'] > 0:
+            self.pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker)
+        self.started = time.monotonic()
+        self.created = self.skipped = self.failed = 0
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            chunk = []
+            for line_number, record, error in read_records(stream, options['start_line']):
+                if error is None:
+                    try:
+                        chunk.append((line_number, validate_record(record)))
+                    except ValidationError as exc:
+                        error = json.dumps(exc.detail)
+                if error is not None:
+                    self.failed += 1
+                    self.stderr.write(f'line {line_number}: {error}')
+                if len(chunk) >= options['chunk_size']:
+                    self.flush(chunk)
+                    chunk = []
+            if chunk:
+                self.flush(chunk)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if self.pool is not None:
+                self.pool.shutdown()
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.created} profiles, skipped {self.skipped} existing, {self.failed} invalid '
+            f'in {elapsed:.1f}s ({self.created / elapsed if elapsed else 0:.0f} profiles/s)'
+        ))
+
+    def flush(self, chunk):
+        seen = existing_usernames([entry for _, entry in chunk])
+        entries = []
+        for line_number, entry in chunk:
+            username = entry['user']['username']
+            if username in seen:
+                self.skipped += 1
+                continue
+            seen.add(username)
+            entries.append(entry)
+        if entries:
+            insert_chunk(entries, self.pool)
+        self.created += len(entries)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'committed through line {chunk[-1][0]}: {self.created} created, {self.skipped} skipped '
+            f'({self.created / elapsed if elapsed else 0:.0f} profiles/s)'
+        )
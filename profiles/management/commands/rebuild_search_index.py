@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from profiles.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text profile search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from profiles.models import COUNTER_FIELDS, EmployeeProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the section counter columns of every profile with the section tables '
+        'and recount the profiles that drifted, one short transaction per batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drifted profiles')
+
+    def handle(self, *args, **options):
+        drift = Q()
+        for field in COUNTER_FIELDS.values():
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        profiles = EmployeeProfile.objects.order_by('id')
+        checked = repaired = 0
+        last_id = 0
+        while True:
+            ids = list(profiles.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                drifted = list(
+                    EmployeeProfile.objects.filter(id__in=ids).with_actual_counts()
+                    .filter(drift).values_list('id', flat=True)
+                )
+                if drifted and not options['dry_run']:
+                    EmployeeProfile.objects.filter(id__in=drifted).recount()
+            for profile_id in drifted:
+                self.stdout.write(f'Profile {profile_id}: counters drifted')
+            checked += len(ids)
+            repaired += len(drifted)
+            last_id = ids[-1]
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {repaired} of {checked} profiles'))
@@ -0,0 +1,133 @@
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Skill
+
+# Free-text proficiency labels mapped onto a 0..1 weight
+PROFICIENCY_LEVELS = {
+    'beginner': 0.25, 'basic': 0.25, 'novice': 0.25, 'low': 0.25, 'junior': 0.25,
+    'intermediate': 0.5, 'medium': 0.5, 'good': 0.5,
+    'advanced': 0.75, 'high': 0.75, 'senior': 0.75, 'proficient': 0.75,
+    'expert': 1.0, 'master': 1.0, 'native': 1.0,
+}
+DEFAULT_PROFICIENCY = 0.5
+
+
+def normalize_skill(name):
+    return ' '.join(name.lower().split())
+
+
+def proficiency_weight(value):
+    """Map a proficiency label (``expert``, ``4/5``, ``80%``, ``3``) to 0..1"""
+    value = (value or '').strip().lower()
+    if value in PROFICIENCY_LEVELS:
+        return PROFICIENCY_LEVELS[value]
+    number = re.match(r'^(\d+(?:\.\d+)?)\s*(%|/\s*(\d+))?$', value)
+    if number:
+        amount = float(number.group(1))
+        if number.group(2) == '%':
+            scale = 100.0
+        elif number.group(3):
+            scale = float(number.group(3))
+        else:
+            scale = 5.0
+        return max(0.0, min(amount / scale, 1.0)) if scale else DEFAULT_PROFICIENCY
+    return DEFAULT_PROFICIENCY
+
+
+class SkillIndex:
+    """
+    In-process inverted index from normalized skill name to
+    ``{profile_id: proficiency weight}``. Built lazily from the Skill table,
+    kept current per profile by the section signals, and rebuilt after
+    ``ttl`` seconds so other worker processes converge as well.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'SKILL_INDEX_TTL', 15 * 60)
+        self._lock = threading.RLock()
+        self._postings = None
+        self._profiles = {}
+        self._built_at = 0.0
+
+    @property
+    def is_built(self):
+        return self._postings is not None
+
+    def ensure_built(self):
+        if self._postings is None or time.monotonic() - self._built_at > self.ttl:
+            self.rebuild()
+
+    def rebuild(self):
+        postings = defaultdict(dict)
+        profiles = defaultdict(dict)
+        rows = Skill.objects.values_list('profile_id', 'name', 'prificiency').iterator(chunk_size=5000)
+        for profile_id, name, proficiency in rows:
+            self._add(postings, profiles, profile_id, name, proficiency)
+        with self._lock:
+            self._postings, self._profiles = postings, profiles
+            self._built_at = time.monotonic()
+
+    @staticmethod
+    def _add(postings, profiles, profile_id, name, proficiency):
+        skill = normalize_skill(name)
+        # A skill listed twice counts at its best proficiency
+        weight = max(proficiency_weight(proficiency), profiles[profile_id].get(skill, 0.0))
+        postings[skill][profile_id] = weight
+        profiles[profile_id][skill] = weight
+
+    def refresh_profiles(self, profile_ids):
+        """Reload the skills of ``profile_ids``; a no-op until the index is built"""
+        if self._postings is None:
+            return
+        profile_ids = set(profile_ids)
+        rows = list(Skill.objects.filter(profile_id__in=profile_ids).values_list('profile_id', 'name', 'prificiency'))
+        with self._lock:
+            self._remove(profile_ids)
+            for profile_id, name, proficiency in rows:
+                self._add(self._postings, self._profiles, profile_id, name, proficiency)
+
+    def remove_profiles(self, profile_ids):
+        if self._postings is None:
+            return
+        with self._lock:
+            self._remove(profile_ids)
+
+    def _remove(self, profile_ids):
+        for profile_id in profile_ids:
+            for skill in self._profiles.pop(profile_id, {}):
+                posting = self._postings.get(skill)
+                if posting is not None:
+                    posting.pop(profile_id, None)
+                    if not posting:
+                        del self._postings[skill]
+
+    def match(self, requirements, limit=10):
+        """
+        Rank profiles against ``requirements``, a list of
+        ``(skill, min_proficiency, weight)``. A profile earns
+        ``weight * proficiency`` for each required skill it has at or above
+        the minimum; scores are normalized by the total weight to 0..1.
+        Only postings of the requested skills are visited.
+        """
+        self.ensure_built()
+        scores = defaultdict(float)
+        matched = defaultdict(list)
+        total = sum(weight for _, _, weight in requirements) or 1.0
+        with self._lock:
+            for skill, minimum, weight in requirements:
+                skill = normalize_skill(skill)
+                for profile_id, proficiency in self._postings.get(skill, {}).items():
+                    if proficiency >= minimum:
+                        scores[profile_id] += weight * proficiency
+                        matched[profile_id].append(skill)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(profile_id, score / total, matched[profile_id]) for profile_id, score in best]
+
+
+skill_index = SkillIndex()
@@ -0,0 +1,137 @@
+"""
+Media file serving for production: strong ETags, long-lived cache headers,
+single-range requests, and optional hand-off of the transfer to the front
+proxy (X-Sendfile / X-Accel-Redirect). Without a proxy hand-off, whole-file
+responses go through FileResponse so the WSGI server can use sendfile().
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# 'x-sendfile' (Apache/lighttpd), 'x-accel-redirect' (nginx) or None
+SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+# nginx "internal" location aliasing MEDIA_ROOT, used with x-accel-redirect
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Files that may still change under the same name
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60)
+# Content-addressed names never change content (see storage.py)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STREAM_CHUNK_SIZE = 64 * 1024
+
+DIGEST_NAME = re.compile(r'(^|/)[0-9a-f]{64}[^/]*$')
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(path, st):
+    if DIGEST_NAME.search(path):
+        # The digest names the exact bytes; only the variant suffix varies
+        return '"%s"' % os.path.basename(path).replace('"', '')
+    return '"%x-%x-%x"' % (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def cache_control(path):
+    if DIGEST_NAME.search(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={MEDIA_MAX_AGE}'
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single satisfiable range, None to send the whole
+    file, or ``False`` if the range cannot be satisfied"""
+    match = RANGE_HEADER.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: serving the full body is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def stream_range(path, start, end):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def set_headers(response, path, st, etag):
+    content_type, encoding = mimetypes.guess_type(path)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(st.st_mtime)
+    response['Cache-Control'] = cache_control(path)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404('Media file not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('Media file not found')
+
+    etag = file_etag(path, st)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if isinstance(not_modified, HttpResponseNotModified):
+        return set_headers(not_modified, path, st, etag)
+    if not_modified is not None:
+        return not_modified
+
+    if SENDFILE_BACKEND == 'x-accel-redirect':
+        # nginx performs the transfer, ranges included
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(path)
+        return set_headers(response, path, st, etag)
+    if SENDFILE_BACKEND == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = full_path
+        return set_headers(response, path, st, etag)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(range_header, st.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{st.st_size}'
+        return response
+    if byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(stream_range(full_path, start, end), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+        return set_headers(response, path, st, etag)
+
+    # Whole file: FileResponse lets the server use wsgi.file_wrapper/sendfile
+    response = FileResponse(open(full_path, 'rb'))
+    return set_headers(response, path, st, etag)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employeeprofile',
+            index=models.Index(fields=['joined_at', 'id'], name='profile_joined_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:50
+
+from django.db import migrations
+
+
+CREATE_SQL = """
+CREATE VIRTUAL TABLE profiles_search USING fts5(
+    position, bio, skills, projects, education, certifications,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POPULATE_SQL = """
+INSERT INTO profiles_search (rowid, position, bio, skills, projects, education, certifications)
+SELECT p.id, p.position, COALESCE(p.bio, ''),
+    COALESCE((SELECT group_concat(s.name, ' ') FROM profiles_skill s WHERE s.profile_id = p.id), ''),
+    COALESCE((SELECT group_concat(r.title || ' ' || r.technologies_used, ' ') FROM profiles_project r WHERE r.profile_id = p.id), ''),
+    COALESCE((SELECT group_concat(e.institution || ' ' || e.degree, ' ') FROM profiles_education e WHERE e.profile_id = p.id), ''),
+    COALESCE((SELECT group_concat(c.title || ' ' || c.issuer, ' ') FROM profiles_certification c WHERE c.profile_id = p.id), '')
+FROM profiles_employeeprofile p
+"""
+
+
+def create_search_index(apps, schema_editor):
+    # The full-text index is SQLite-only; profiles/search.py falls back to
+    # LIKE queries elsewhere.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS profiles_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
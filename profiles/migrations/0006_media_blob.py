@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:43
+
+import profiles.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_images(apps, schema_editor):
+    # Files uploaded before content addressing get one blob row per name
+    Project = apps.get_model('profiles', 'Project')
+    MediaBlob = apps.get_model('profiles', 'MediaBlob')
+    counts = (
+        Project.objects.exclude(image='').exclude(image__isnull=True)
+        .values('image').annotate(refs=Count('id'))
+    )
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=row['image'], ref_count=row['refs']) for row in counts],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0005_project_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=profiles.storage.project_image_storage, upload_to='projects/'),
+        ),
+        migrations.RunPython(count_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0006_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certification',
+            index=models.Index(fields=['expiry_date', 'id'], name='cert_expiry_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['profile', 'start_date'], name='project_profile_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['profile', 'name'], name='skill_profile_name_idx'),
+        ),
+    ]
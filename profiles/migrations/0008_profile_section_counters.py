@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_rows(apps, schema_editor):
+    EmployeeProfile = apps.get_model('profiles', 'EmployeeProfile')
+    counters = {
+        'skills_count': apps.get_model('profiles', 'Skill'),
+        'education_count': apps.get_model('profiles', 'Education'),
+        'certifications_count': apps.get_model('profiles', 'Certification'),
+        'projects_count': apps.get_model('profiles', 'Project'),
+    }
+    EmployeeProfile.objects.update(**{
+        field: Coalesce(Subquery(
+            model.objects.filter(profile=OuterRef('pk')).order_by().values('profile')
+            .annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ), 0)
+        for field, model in counters.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0007_section_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='certifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='education_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='projects_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='employeeprofile',
+            name='skills_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='employeeprofile',
+            index=models.Index(fields=['skills_count', 'id'], name='profile_skills_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employeeprofile',
+            index=models.Index(fields=['projects_count', 'id'], name='profile_projects_count_idx'),
+        ),
+        migrations.RunPython(count_existing_rows, migrations.RunPython.noop),
+    ]
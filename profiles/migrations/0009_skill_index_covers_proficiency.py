@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_profile_section_counters'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='skill',
+            name='skill_profile_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['profile', 'name', 'prificiency'], name='skill_profile_name_idx'),
+        ),
+    ]
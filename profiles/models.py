@@ -1,38 +1,157 @@
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from .storage import project_image_storage
 # Create your models here.
 
+def _child_count(model):
+    """Correlated subquery counting ``model`` rows for the outer profile"""
+    counts = (
+        model.objects.filter(profile=OuterRef('pk'))
+        .order_by()
+        .values('profile')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+# Reverse accessors of the CV section models
+SECTIONS = ('skills', 'education', 'certifications', 'projects')
+
+# Denormalized row count column on EmployeeProfile for each section
+COUNTER_FIELDS = {name: f'{name}_count' for name in SECTIONS}
+
+class EmployeeProfileQuerySet(models.QuerySet):
+    def with_actual_counts(self, *sections):
+        """
+        Annotate ``actual_<section>_count`` with the row count computed by the
+        database, for every section (or only ``sections``); used to check the
+        counter columns.
+        """
+        return self.annotate(**{
+            f'actual_{COUNTER_FIELDS[name]}': _child_count(EmployeeProfile._meta.get_field(name).related_model)
+            for name in (sections or SECTIONS)
+        })
+
+    def recount(self, *sections):
+        """Reset the counter columns from the section tables in a single UPDATE"""
+        return self.update(**{
+            COUNTER_FIELDS[name]: _child_count(EmployeeProfile._meta.get_field(name).related_model)
+            for name in (sections or SECTIONS)
+        })
+
+    def with_sections(self, *lookups):
+        """Prefetch every child collection (or only ``lookups``) for the CV document"""
+        return self.prefetch_related(*(lookups or SECTIONS))
+
 class EmployeeProfile(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='profiles')
     bio = models.TextField(blank=True, null=True)
     position = models.CharField(max_length=100)
     joined_at = models.DateTimeField(auto_now_add=True)
+    # Also touched whenever a section row changes (see signals.py), so it is
+    # the last-modified time of the whole CV document.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Section row counts, kept in step by signals.mark_profiles_changed and
+    # checked by the repair_profile_counters command
+    skills_count = models.PositiveIntegerField(default=0, editable=False)
+    education_count = models.PositiveIntegerField(default=0, editable=False)
+    certifications_count = models.PositiveIntegerField(default=0, editable=False)
+    projects_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = EmployeeProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for the profile list
+            models.Index(fields=['joined_at', 'id'], name='profile_joined_at_id_idx'),
+            # Profile list ordered by counts (?ordering=-skills_count)
+            models.Index(fields=['skills_count', 'id'], name='profile_skills_count_idx'),
+            models.Index(fields=['projects_count', 'id'], name='profile_projects_count_idx'),
+        ]
 
-class Skill(models.Model):
+    def save(self, *args, **kwargs):
+        # The counters are only ever changed by F() updates; writing back the
+        # values loaded with this instance would undo concurrent section writes
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS.values()
+            ]
+        super().save(*args, **kwargs)
+
+class ProfileSection(models.Model):
+    """Base of the CV section models"""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # The profile a row was loaded with, so moving it to another profile
+        # can adjust both profiles' counters
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_profile_id = instance.__dict__.get('profile_id')
+        return instance
+
+class Skill(ProfileSection):
     profile = models.ForeignKey(EmployeeProfile, on_delete=models.CASCADE, related_name='skills')
     name = models.CharField(max_length=100)
     prificiency = models.CharField(max_length=50)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A profile's skills by name; with the proficiency it covers the
+            # skill matching index reads (profiles/matching.py)
+            models.Index(fields=['profile', 'name', 'prificiency'], name='skill_profile_name_idx'),
+        ]
     
-class Education(models.Model):
+class Education(ProfileSection):
     profile = models.ForeignKey(EmployeeProfile, on_delete=models.CASCADE, related_name='education')
     institution = models.CharField(max_length=200)
     degree = models.CharField(max_length=100)
     start_year = models.DateField()
     end_year = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
-class Certification(models.Model):
+class Certification(ProfileSection):
     profile = models.ForeignKey(EmployeeProfile, on_delete=models.CASCADE, related_name='certifications')
     title = models.CharField(max_length=200)
     issuer = models.CharField(max_length=200)
     issued_date = models.DateField()
     expiry_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Expiry window scans in keyset order (certifications/expiring/)
+            models.Index(fields=['expiry_date', 'id'], name='cert_expiry_date_id_idx'),
+        ]
     
-class Project(models.Model):
+class Project(ProfileSection):
     profile = models.ForeignKey(EmployeeProfile, on_delete=models.CASCADE, related_name='projects')
     title = models.CharField(max_length=200)
     description = models.TextField()
     technologies_used = models.CharField(max_length=200)
     project_url = models.URLField(blank=True)
-    image = models.ImageField(upload_to='projects/', blank=True, null=True)
+    # Content-addressed, so identical uploads share one file (see storage.py)
+    image = models.ImageField(upload_to='projects/', storage=project_image_storage, blank=True, null=True)
+    # Storage names of the generated WebP variants plus the 'source' image
+    # they were made from, filled in by profiles/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     start_date = models.DateField()
-    end_date = models.DateField(null=True, blank=True)
\ No newline at end of file
+    end_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A profile's projects in chronological order
+            models.Index(fields=['profile', 'start_date'], name='project_profile_start_idx'),
+        ]
+
+class MediaBlob(models.Model):
+    """Reference count of a stored media file shared by several rows"""
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
@@ -0,0 +1,152 @@
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the view's ``cursor_ordering`` columns, the
+    last of which must be unique (ties are broken by id). Cursors carry the
+    values of every ordering column of the row they continue from, so a page
+    is one range scan on the matching index however many rows share the
+    leading value. No COUNT(*) is issued unless the client passes
+    ``?count=true``.
+    """
+    ordering = ('id',)
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, 'cursor_ordering', self.ordering))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+
+        # A reverse cursor reads the rows before its position backwards
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(_after(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        # Links continue from the page's edge rows, or from the cursor's own
+        # position when the page came back empty
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            self.next_position = self.previous_position = position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        position = None if cursor.position is None else json.dumps(cursor.position, separators=(',', ':'))
+        return super().encode_cursor(cursor._replace(position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for column in ordering:
+            name = column.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(None if value is None else str(value))
+        return values
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+
+def _reverse_ordering(ordering):
+    return tuple(column[1:] if column.startswith('-') else f'-{column}' for column in ordering)
+
+
+def _after(ordering, position):
+    """
+    Rows strictly after ``position`` in ``ordering``: the row value
+    comparison (a, b) > (x, y) written as a >= x AND (a > x OR (a = x AND
+    b > y)). The leading bound on its own lets SQLite range-scan the index.
+    """
+    condition = None
+    for column, value in reversed(list(zip(ordering, position))):
+        name = column.lstrip('-')
+        lookup = f'{name}__lt' if column.startswith('-') else f'{name}__gt'
+        beyond = Q(**{lookup: value})
+        condition = beyond if condition is None else beyond | Q(**{name: value}) & condition
+    column, value = ordering[0], position[0]
+    bound = f'{column[1:]}__lte' if column.startswith('-') else f'{column}__gte'
+    return Q(**{bound: value}) & condition
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination by default; clients opt into keyset pagination
+    per request with ``?pagination=cursor`` (or by following a ``cursor`` link).
+    """
+    mode_query_param = 'pagination'
+    cursor_class = KeysetPagination
+
+    def use_cursor(self, request):
+        params = request.query_params
+        return self.cursor_class.cursor_query_param in params or params.get(self.mode_query_param) == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -10,7 +10,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
         
         # Write permissions are only allowed to the owner of the profile
-        return obj.owner == request.user
+        return obj.owner_id == request.user.id
 
 class IsProfileOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -22,15 +22,16 @@ class IsProfileOwnerOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
         
-        # Write permissions are only allowed to the owner of the profile
-        return obj.profile.owner == request.user
+        # Write permissions are only allowed to the owner of the profile.
+        # Ids are compared so no User row has to be loaded.
+        return obj.profile.owner_id == request.user.id
 
 class IsOwner(permissions.BasePermission):
     """
     Custom permission to only allow owners of an object to access it.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        return obj.owner_id == request.user.id
 
 class CanEditOwnProfileOnly(permissions.BasePermission):
     """
@@ -47,4 +48,4 @@ class CanEditOwnProfileOnly(permissions.BasePermission):
             return True
         
         # Only allow editing own profile
-        return obj.owner == request.user
\ No newline at end of file
+        return obj.owner_id == request.user.id
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""
+Opt-in request profiling for the profile API.
+
+ProfilingMiddleware captures requests to the viewsets in ``profiles.views``.
+It takes a random ``PROFILING_SAMPLE_RATE`` fraction of them, which run
+under cProfile. It also takes any request slower than
+``PROFILING_SLOW_REQUEST_MS``, which a background thread stack-samples
+while it runs. Each capture records the SQL run, ``EXPLAIN`` output for the
+slowest SELECTs, and the serializer used. Captures are stored as JSON files
+in a rotating directory, browsable by staff at ``/admin/captures/``. With
+both settings off the middleware removes itself.
+"""
+import contextvars
+import datetime
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.http import Http404
+from django.shortcuts import render
+
+from .instrumentation import current_metrics
+
+SAMPLE_RATE = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+SLOW_REQUEST_MS = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', None)
+STORE_DIR = getattr(settings, 'PROFILING_STORE_DIR', os.path.join(settings.BASE_DIR, 'var', 'captures'))
+STORE_MAX_FILES = getattr(settings, 'PROFILING_STORE_MAX_FILES', 200)
+EXPLAIN_SLOWEST = 3
+PROFILE_LINES = 40
+STACK_SAMPLE_INTERVAL = 0.005
+PROFILED_VIEW_MODULE = 'profiles.views'
+
+CAPTURE_NAME = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{32}\.json$')
+
+
+class CaptureStore:
+    """Capture records as JSON files, keeping only the newest ``max_files``"""
+
+    def __init__(self, directory=None, max_files=None):
+        self.directory = str(directory or STORE_DIR)
+        self.max_files = max_files or STORE_MAX_FILES
+
+    def names(self):
+        try:
+            return sorted((name for name in os.listdir(self.directory) if CAPTURE_NAME.match(name)), reverse=True)
+        except FileNotFoundError:
+            return []
+
+    def save(self, record):
+        os.makedirs(self.directory, exist_ok=True)
+        captured_at = datetime.datetime.fromtimestamp(record['captured_at'], tz=datetime.timezone.utc)
+        # Names sort chronologically, so rotation drops the oldest
+        name = f'{captured_at:%Y%m%dT%H%M%S%f}-{record["id"]}.json'
+        temporary = os.path.join(self.directory, f'.{name}.tmp')
+        with open(temporary, 'w', encoding='utf-8') as stream:
+            json.dump(record, stream, default=repr)
+        os.replace(temporary, os.path.join(self.directory, name))
+        for stale in self.names()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, stale))
+            except FileNotFoundError:
+                pass
+        return name
+
+    def load(self, name):
+        if not CAPTURE_NAME.match(name):
+            raise FileNotFoundError(name)
+        with open(os.path.join(self.directory, name), encoding='utf-8') as stream:
+            return json.load(stream)
+
+
+class StackSampler(threading.Thread):
+    """Daemon thread folding the stacks of registered request threads into counters"""
+
+    def __init__(self, interval=STACK_SAMPLE_INTERVAL):
+        super().__init__(name='request-stack-sampler', daemon=True)
+        self.interval = interval
+        self.active = {}
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, counter in list(self.active.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    counter[fold_stack(frame)] += 1
+
+    def start_sampling(self):
+        counter = Counter()
+        self.active[threading.get_ident()] = counter
+        return counter
+
+    def stop_sampling(self):
+        self.active.pop(threading.get_ident(), None)
+
+
+def fold_stack(frame, limit=64):
+    parts = []
+    while frame is not None and len(parts) < limit:
+        code = frame.f_code
+        parts.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler()
+            _sampler.start()
+    return _sampler
+
+
+class Capture:
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.target = False
+        self.profiler = None
+        self.stacks = None
+        self.queries = []
+
+    def execute_wrapper(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                if self.target:
+                    self.queries.append({
+                        'alias': alias,
+                        'sql': sql,
+                        'params': None if many else params,
+                        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                    })
+        return wrapper
+
+    def track_queries(self):
+        """Record the queries on this thread's connections until the returned stack is closed"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self.execute_wrapper(alias)))
+        return stack
+
+    def stop(self):
+        # On the thread process_view() started them on: both are per thread
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.stacks is not None:
+            get_sampler().stop_sampling()
+
+
+_capture = contextvars.ContextVar('profiles_request_capture', default=None)
+
+
+def explain(query):
+    """Plan of a captured SELECT as a list of text rows"""
+    if query['params'] is None or not query['sql'].lstrip().upper().startswith('SELECT'):
+        return None
+    connection = connections[query['alias']]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {query["sql"]}', query['params'])
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except DatabaseError as exc:
+        return [f'EXPLAIN failed: {exc}']
+
+
+class ProfilingMiddleware:
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        if not SAMPLE_RATE and not SLOW_REQUEST_MS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.store = CaptureStore()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        capture = Capture(sampled=random.random() < SAMPLE_RATE)
+        token = _capture.set(capture)
+        started = time.perf_counter()
+        try:
+            with capture.track_queries():
+                response = self.get_response(request)
+        finally:
+            capture.stop()
+            _capture.reset(token)
+        self.finish(request, response, capture, (time.perf_counter() - started) * 1000)
+        return response
+
+    async def __acall__(self, request):
+        # The views' queries, the profiler and the stack sampler all run on
+        # the sync_to_async thread, so they are set up and torn down there
+        capture = Capture(sampled=random.random() < SAMPLE_RATE)
+        token = _capture.set(capture)
+        started = time.perf_counter()
+        try:
+            stack = await sync_to_async(capture.track_queries)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+                await sync_to_async(capture.stop)()
+        finally:
+            _capture.reset(token)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if capture.target:
+            await sync_to_async(self.finish)(request, response, capture, duration_ms)
+        return response
+
+    def finish(self, request, response, capture, duration_ms):
+        slow = SLOW_REQUEST_MS is not None and duration_ms >= SLOW_REQUEST_MS
+        if capture.target and (capture.sampled or slow):
+            self.store.save(self.build_record(request, response, capture, duration_ms, slow))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        capture = _capture.get()
+        view_class = getattr(view_func, 'cls', None)
+        if capture is None or view_class is None or view_class.__module__ != PROFILED_VIEW_MODULE:
+            return None
+        capture.target = True
+        if capture.sampled:
+            capture.profiler = cProfile.Profile()
+            capture.profiler.enable()
+        elif SLOW_REQUEST_MS:
+            # Only slow requests are kept, but slowness is only known at the end
+            capture.stacks = get_sampler().start_sampling()
+        return None
+
+    def build_record(self, request, response, capture, duration_ms, slow):
+        metrics = current_metrics()
+        slowest = sorted(capture.queries, key=lambda query: query['duration_ms'], reverse=True)
+        explained = []
+        with metrics.untracked() if metrics else nullcontext():
+            for query in slowest:
+                if len(explained) == EXPLAIN_SLOWEST:
+                    break
+                plan = explain(query)
+                if plan is not None:
+                    explained.append({**query, 'plan': plan})
+        profile = None
+        if capture.profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(capture.profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            profile = stream.getvalue()
+        return {
+            'id': uuid.uuid4().hex,
+            'captured_at': time.time(),
+            'reasons': [reason for reason, hit in (('sampled', capture.sampled), ('slow', slow)) if hit],
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'endpoint': metrics.endpoint if metrics else request.resolver_match.view_name,
+            'serializer': metrics.serializer if metrics else None,
+            'duration_ms': round(duration_ms, 3),
+            'query_count': len(capture.queries),
+            'db_ms': round(sum(query['duration_ms'] for query in capture.queries), 3),
+            'slowest_queries': explained,
+            'queries': capture.queries,
+            'profile': profile,
+            'stack_samples': [
+                {'stack': stack, 'count': count} for stack, count in (capture.stacks or Counter()).most_common(50)
+            ],
+        }
+
+
+def captured_time(record):
+    return datetime.datetime.fromtimestamp(record['captured_at'], tz=datetime.timezone.utc)
+
+
+@staff_member_required
+def capture_list(request):
+    store = CaptureStore()
+    captures = []
+    for name in store.names():
+        try:
+            record = store.load(name)
+        except (OSError, ValueError):
+            continue
+        captures.append({'name': name, 'captured': captured_time(record), **{key: record.get(key) for key in (
+            'reasons', 'method', 'path', 'status', 'endpoint', 'duration_ms', 'query_count', 'db_ms',
+        )}})
+    return render(request, 'profiles/captures/list.html', {
+        'title': 'Request captures',
+        'captures': captures,
+        'sample_rate': SAMPLE_RATE,
+        'slow_request_ms': SLOW_REQUEST_MS,
+    })
+
+
+@staff_member_required
+def capture_detail(request, name):
+    try:
+        record = CaptureStore().load(name)
+    except (OSError, ValueError):
+        raise Http404('Capture not found')
+    return render(request, 'profiles/captures/detail.html', {
+        'title': f'{record["method"]} {record["path"]}',
+        'record': record,
+        'captured': captured_time(record),
+        'name': name,
+    })
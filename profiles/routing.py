@@ -0,0 +1,150 @@
+"""
+Read-replica routing for the profile API.
+
+``ReplicaRoutingMiddleware`` marks safe-method requests to views with
+``replica_reads = True`` and ``ReplicaRouter`` sends their queries to the
+``replica`` alias. A client that has just written is pinned to the primary
+for ``DATABASE_REPLICA_STICKY_SECONDS`` so it always reads its own writes;
+the pins live in the cache, which must be shared by every worker process
+(checked by checks.py). Nothing changes when no ``replica`` database is
+configured.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+REPLICA_ALIAS = 'replica'
+# Should comfortably exceed the replica's normal replication lag
+STICKY_SECONDS = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = contextvars.ContextVar('profiles_read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.databases
+
+
+@contextmanager
+def read_from_primary():
+    """Route reads inside the block to the primary, e.g. to fill a shared cache"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+def _sticky_key(user_id):
+    return f'profiles:db:sticky:{user_id}'
+
+
+def request_user_id(request):
+    """User id from the request's access token; only signature and expiry are checked"""
+    from .authentication import request_access_token
+    try:
+        token = request_access_token(request)
+    except InvalidToken:
+        return None
+    return token and token.get(jwt_settings.USER_ID_CLAIM)
+
+
+def view_class(view_func):
+    """The DRF view class behind ``view_func``, looking through async read wrappers (async_views.py)"""
+    return getattr(getattr(view_func, 'sync_view', view_func), 'cls', None)
+
+
+def replica_eligible(method, view_func):
+    """Whether requests to ``view_func`` may read from the replica at all"""
+    if method not in SAFE_METHODS or not replica_configured():
+        return False
+    return getattr(view_class(view_func), 'replica_reads', False)
+
+
+def pinned_to_primary(user_id):
+    return user_id is not None and bool(cache.get(_sticky_key(user_id)))
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for the next STICKY_SECONDS"""
+    cache.set(_sticky_key(user_id), True, STICKY_SECONDS)
+
+
+@contextmanager
+def read_from_replica():
+    """Route reads inside the block to the replica, e.g. for one sub-request of a batch"""
+    token = _read_alias.set(REPLICA_ALIAS)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # process_view may route this request to the replica; undo it afterwards
+        previous = _read_alias.get()
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.set(previous)
+        self.pin_after_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        previous = _read_alias.get()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.set(previous)
+        self.pin_after_write(request, response)
+        return response
+
+    def pin_after_write(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and replica_configured():
+            # Views that only forward other requests (see batch.py) pin the client themselves
+            view_func = getattr(getattr(request, 'resolver_match', None), 'func', None)
+            user_id = request_user_id(request)
+            if user_id is not None and getattr(view_class(view_func), 'pins_primary_on_write', True):
+                pin_to_primary(user_id)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not replica_eligible(request.method, view_func):
+            return None
+        if pinned_to_primary(request_user_id(request)):
+            return None
+        _read_alias.set(REPLICA_ALIAS)
+        return None
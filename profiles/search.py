@@ -0,0 +1,160 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import EmployeeProfile, Skill, Education, Certification, Project
+
+# FTS5 shadow table with one document per profile, rowid = profile id.
+# Created by migration 0004 on SQLite; other databases fall back to a LIKE scan.
+SEARCH_TABLE = 'profiles_search'
+SEARCH_COLUMNS = ('position', 'bio', 'skills', 'projects', 'education', 'certifications')
+# bm25() weight per column, in SEARCH_COLUMNS order
+SEARCH_WEIGHTS = (4.0, 1.0, 5.0, 2.0, 1.0, 1.0)
+# Columns built from the profile row; the others are named after the
+# section they are built from
+PROFILE_COLUMNS = ('position', 'bio')
+SECTION_SOURCES = (
+    ('skills', Skill, ('name',)),
+    ('projects', Project, ('title', 'technologies_used')),
+    ('education', Education, ('institution', 'degree')),
+    ('certifications', Certification, ('title', 'issuer')),
+)
+SECTION_COLUMNS = {model: column for column, model, _ in SECTION_SOURCES}
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_documents(profile_ids, columns=SEARCH_COLUMNS):
+    """Index text of ``columns`` for each profile, keyed by profile id"""
+    if any(name in columns for name in PROFILE_COLUMNS):
+        documents = {
+            profile_id: {'position': position, 'bio': bio or ''}
+            for profile_id, position, bio in
+            EmployeeProfile.objects.filter(id__in=profile_ids).values_list('id', 'position', 'bio')
+        }
+    else:
+        documents = {profile_id: {} for profile_id in profile_ids}
+    for column, model, fields in SECTION_SOURCES:
+        if column not in columns:
+            continue
+        for doc in documents.values():
+            doc[column] = []
+        for profile_id, *values in model.objects.filter(profile_id__in=documents).values_list('profile_id', *fields):
+            documents[profile_id][column].extend(values)
+    return {
+        profile_id: {name: ' '.join(value) if isinstance(value, list) else value for name, value in doc.items()}
+        for profile_id, doc in documents.items()
+    }
+
+
+def reindex_profiles(profile_ids, columns=SEARCH_COLUMNS):
+    """
+    Rebuild the index rows of ``profile_ids``; missing profiles are dropped.
+    Given a subset of the ``columns``, only those are rewritten, from only
+    the tables they are built from.
+    """
+    profile_ids = list(profile_ids)
+    columns = [name for name in SEARCH_COLUMNS if name in columns]
+    if not profile_ids or not columns or not fts_available():
+        return
+    documents = build_documents(profile_ids, columns)
+    if len(columns) < len(SEARCH_COLUMNS):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {SEARCH_TABLE} SET {", ".join(f"{name} = %s" for name in columns)} WHERE rowid = %s',
+                [[doc[name] for name in columns] + [profile_id] for profile_id, doc in documents.items()],
+            )
+        return
+    placeholders = ', '.join(['%s'] * len(profile_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', profile_ids)
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {", ".join(SEARCH_COLUMNS)}) '
+            f'VALUES (%s, {", ".join(["%s"] * len(SEARCH_COLUMNS))})',
+            [[profile_id] + [doc[name] for name in SEARCH_COLUMNS] for profile_id, doc in documents.items()],
+        )
+
+
+def drop_profiles(profile_ids):
+    profile_ids = list(profile_ids)
+    if not profile_ids or not fts_available():
+        return
+    placeholders = ', '.join(['%s'] * len(profile_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', profile_ids)
+
+
+def rebuild_index(batch_size=1000):
+    """Reindex every profile, ``batch_size`` at a time"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    ids = EmployeeProfile.objects.order_by('id').values_list('id', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        reindex_profiles(batch)
+        last_id = batch[-1]
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    terms = re.findall(r'\w+', query)
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+class ProfileSearchResults:
+    """
+    Lazily evaluated, ranked profile ids matching ``query``. Supports len()
+    and slicing so Django's Paginator can page through it with LIMIT/OFFSET.
+    """
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+        self.fts = fts_available()
+        self.query = query
+
+    def fallback_queryset(self):
+        condition = Q()
+        for term in re.findall(r'\w+', self.query):
+            condition &= (
+                Q(position__icontains=term) | Q(bio__icontains=term)
+                | Q(skills__name__icontains=term) | Q(projects__technologies_used__icontains=term)
+            )
+        return EmployeeProfile.objects.filter(condition).order_by('id').values_list('id', flat=True).distinct()
+
+    def count(self):
+        if not self.expression:
+            return 0
+        if not self.fts:
+            return self.fallback_queryset().count()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [self.expression])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.expression:
+            return []
+        start = index.start or 0
+        limit = -1 if index.stop is None else index.stop - start
+        if not self.fts:
+            return list(self.fallback_queryset()[index])
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s OFFSET %s',
+                [self.expression, limit, start],
+            )
+            return [row[0] for row in cursor.fetchall()]
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import EmployeeProfile, Skill, Education, Certification, Project
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from .models import EmployeeProfile, Skill, Education, Certification, Project, SECTIONS
+from .signals import batched_section_changes, mark_profiles_changed, section_counts
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -48,11 +52,24 @@ class CertificationSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 class ProjectSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Project
         fields = '__all__'
         read_only_fields = ['id']
 
+    def get_image_variants(self, obj):
+        # URLs of the generated thumbnails, empty until the pipeline has run
+        request = self.context.get('request')
+        urls = {}
+        for name, path in (obj.image_variants or {}).items():
+            if name == 'source':
+                continue
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
     def create(self, validated_data):
         # Ensure the project belongs to a profile owned by the current user
         profile = validated_data['profile']
@@ -79,22 +96,14 @@ class EmployeeProfileDetailSerializer(serializers.ModelSerializer):
 class EmployeeProfileListSerializer(serializers.ModelSerializer):
     """Simplified serializer for list view"""
     owner = UserSerializer(read_only=True)
-    skills_count = serializers.SerializerMethodField()
-    projects_count = serializers.SerializerMethodField()
     
     class Meta:
         model = EmployeeProfile
         fields = [
             'id', 'owner', 'bio', 'position', 'joined_at',
-            'skills_count', 'projects_count'
+            'skills_count', 'education_count', 'certifications_count', 'projects_count'
         ]
         read_only_fields = ['id', 'owner', 'joined_at']
-    
-    def get_skills_count(self, obj):
-        return obj.skills.count()
-    
-    def get_projects_count(self, obj):
-        return obj.projects.count()
 
 class EmployeeProfileSerializer(serializers.ModelSerializer):
     """Basic serializer for create/update operations"""
@@ -103,4 +112,128 @@ class EmployeeProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmployeeProfile
         fields = ['id', 'owner', 'bio', 'position', 'joined_at']
-        read_only_fields = ['id', 'owner', 'joined_at']
\ No newline at end of file
+        read_only_fields = ['id', 'owner', 'joined_at']
+
+class SkillItemSerializer(serializers.ModelSerializer):
+    """Skill row inside a whole-CV document; ``id`` is omitted for new rows"""
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Skill
+        exclude = ['profile']
+
+class EducationItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Education
+        exclude = ['profile']
+
+class CertificationItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
+    class Meta:
+        model = Certification
+        exclude = ['profile']
+
+class ProjectItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+    image_variants = serializers.JSONField(read_only=True)
+
+    class Meta:
+        model = Project
+        exclude = ['profile']
+        # Images are uploaded through the project endpoints
+        read_only_fields = ['image']
+
+class EmployeeProfileDocumentSerializer(serializers.ModelSerializer):
+    """
+    Writable counterpart of EmployeeProfileDetailSerializer. Saving diffs the
+    submitted sections against the stored rows and only inserts, updates or
+    deletes what changed; sections missing from the payload are left alone.
+    """
+    skills = SkillItemSerializer(many=True, required=False)
+    education = EducationItemSerializer(many=True, required=False)
+    certifications = CertificationItemSerializer(many=True, required=False)
+    projects = ProjectItemSerializer(many=True, required=False)
+
+    class Meta:
+        model = EmployeeProfile
+        fields = [
+            'id', 'bio', 'position', 'joined_at',
+            'skills', 'education', 'certifications', 'projects'
+        ]
+        read_only_fields = ['id', 'joined_at']
+
+    def update(self, instance, validated_data):
+        sections = {name: validated_data.pop(name) for name in SECTIONS if name in validated_data}
+        changes = {}
+        with transaction.atomic(), batched_section_changes():
+            changed_fields = [
+                attr for attr, value in validated_data.items() if getattr(instance, attr) != value
+            ]
+            if changed_fields:
+                for attr in changed_fields:
+                    setattr(instance, attr, validated_data[attr])
+                instance.save(update_fields=changed_fields + ['updated_at'])
+            for name, items in sections.items():
+                changes[name] = self.sync_section(instance, name, items)
+        self.changes = changes
+        return instance
+
+    def sync_section(self, profile, name, items):
+        """Apply the minimal set of writes turning the stored rows into ``items``"""
+        model = EmployeeProfile._meta.get_field(name).related_model
+        existing = model.objects.filter(profile=profile).in_bulk()
+        to_create, to_update, update_fields, kept = [], [], set(), set()
+        # A PATCH validates items partially, but only rows matched by id may
+        # leave fields out: new rows need every required field
+        required = {
+            field_name: field for field_name, field in self.fields[name].child.fields.items()
+            if field.required and not field.read_only
+        }
+        errors = [{} for _ in items]
+        now = timezone.now()
+        for index, item in enumerate(items):
+            item = dict(item)
+            row = existing.get(item.pop('id', None))
+            if row is None or row.pk in kept:
+                errors[index] = {
+                    field_name: [field.error_messages['required']]
+                    for field_name, field in required.items() if field_name not in item
+                }
+                to_create.append(model(profile=profile, **item))
+                continue
+            kept.add(row.pk)
+            fields = [attr for attr, value in item.items() if getattr(row, attr) != value]
+            if fields:
+                for attr in fields:
+                    setattr(row, attr, item[attr])
+                row.updated_at = now
+                update_fields.update(fields)
+                to_update.append(row)
+        if any(errors):
+            raise serializers.ValidationError({name: errors})
+        to_delete = [pk for pk in existing if pk not in kept]
+
+        if to_create:
+            model.objects.bulk_create(to_create)
+            counts = section_counts(model, [profile.pk] * len(to_create))
+            mark_profiles_changed(counts.keys(), counts, columns=[name])
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(update_fields) + ['updated_at'])
+            mark_profiles_changed([profile.pk], columns=[name])
+        if to_delete:
+            model.objects.filter(pk__in=to_delete).delete()
+        return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
+
+class SkillRequirementSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    # Minimum proficiency, in any form Skill.prificiency accepts
+    proficiency = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    weight = serializers.FloatField(min_value=0, default=1.0)
+
+class SkillMatchSerializer(serializers.Serializer):
+    """Requirement set for ranking candidates by skill"""
+    skills = SkillRequirementSerializer(many=True, allow_empty=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
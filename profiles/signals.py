@@ -1,9 +1,223 @@
-from django.db.models.signals import post_save
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import EmployeeProfile
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import invalidate_cached_user
+from .cache import bump_profile_version
+from .models import COUNTER_FIELDS, EmployeeProfile, Skill, Education, Certification, Project
+from .images import delete_variants, needs_processing, schedule_project_image
+from .matching import skill_index
+from .search import PROFILE_COLUMNS, SEARCH_COLUMNS, SECTION_COLUMNS, drop_profiles, reindex_profiles
+from .storage import release, release_all, retain
+from .tokens import cache_blacklisted
 
 @receiver(post_save , sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        EmployeeProfile.objects.create(owner=instance, position='New Employee' )
\ No newline at end of file
+        EmployeeProfile.objects.create(owner=instance, position='New Employee' )
+
+def _invalidate_on_commit(profile_id):
+    # Bump after commit so a concurrent reader cannot re-cache the old rows
+    # under the new version.
+    transaction.on_commit(lambda: bump_profile_version(profile_id))
+
+@receiver(post_save, sender=EmployeeProfile)
+@receiver(post_delete, sender=EmployeeProfile)
+def invalidate_profile_detail(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.pk)
+
+@receiver(post_save, sender=EmployeeProfile)
+def index_profile(sender, instance, created, update_fields=None, **kwargs):
+    # Saves change only the columns built from the profile row
+    columns = SEARCH_COLUMNS if created else PROFILE_COLUMNS
+    if update_fields is not None:
+        columns = [name for name in columns if name in update_fields]
+    _reindex([instance.pk], columns)
+
+@receiver(post_delete, sender=EmployeeProfile)
+def unindex_profile(sender, instance, **kwargs):
+    drop_profiles([instance.pk])
+    transaction.on_commit(lambda: skill_index.remove_profiles([instance.pk]))
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+@receiver(post_save, sender=Education)
+@receiver(post_delete, sender=Education)
+@receiver(post_save, sender=Certification)
+@receiver(post_delete, sender=Certification)
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_section_profile_detail(sender, instance, signal, created=False, origin=None, **kwargs):
+    # Rows removed by deleting their profile or owner need no touch, the
+    # profile is going away with them
+    if _cascaded_from(origin, EmployeeProfile, User):
+        _invalidate_on_commit(instance.profile_id)
+        return
+    if signal is post_delete:
+        counts = section_counts(sender, [instance.profile_id], -1)
+    elif created:
+        counts = section_counts(sender, [instance.profile_id])
+    else:
+        counts = moved_row_counts(sender, [instance])
+    mark_profiles_changed(counts.keys() | {instance.profile_id}, counts, columns=[SECTION_COLUMNS[sender]])
+    instance._loaded_profile_id = instance.profile_id
+
+@receiver(pre_save, sender=Project)
+def remember_project_image(sender, instance, **kwargs):
+    instance._stored_image = ''
+    # The field stores a new upload after this signal, and the storage
+    # takes the upload's reference itself
+    instance._uploading_image = bool(instance.image) and not instance.image._committed
+    if instance.pk:
+        stored = Project.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+        instance._stored_image = stored or ''
+
+@receiver(post_save, sender=Project)
+def process_project_image(sender, instance, **kwargs):
+    # Keep the blob reference counts in step with the image column
+    previous = getattr(instance, '_stored_image', '')
+    current = instance.image.name if instance.image else ''
+    uploaded = getattr(instance, '_uploading_image', False)
+    if previous != current and not uploaded:
+        retain(current)
+    # Re-uploading the stored content took a second reference to it
+    if previous != current or uploaded:
+        release(previous, on_delete=delete_variants)
+    if needs_processing(instance):
+        schedule_project_image(instance)
+
+@receiver(post_delete, sender=Project)
+def release_project_image(sender, instance, **kwargs):
+    if instance.image:
+        pending = _pending_releases.get()
+        if pending is not None:
+            pending.append(instance.image.name)
+        else:
+            release(instance.image.name, on_delete=delete_variants)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+@receiver(post_save, sender=BlacklistedToken)
+def remember_blacklisted_token(sender, instance, created, **kwargs):
+    # However the token was revoked (logout, rotation, admin), replace a
+    # cached "not blacklisted" at once
+    if created:
+        cache_blacklisted(instance.token.jti, instance.token.expires_at)
+
+@receiver(post_save, sender=User)
+def invalidate_owner_profile_detail(sender, instance, created, **kwargs):
+    # The detail document embeds the owner
+    if not created:
+        mark_profiles_changed(instance.profiles.values_list('id', flat=True), columns=())
+
+_pending_profile_ids = contextvars.ContextVar('pending_profile_ids', default=None)
+_pending_counts = contextvars.ContextVar('pending_counts', default=None)
+_pending_releases = contextvars.ContextVar('pending_releases', default=None)
+_pending_search = contextvars.ContextVar('pending_search', default=None)
+
+@contextmanager
+def batched_section_changes():
+    """
+    Coalesce the per-row profile bookkeeping of many section writes into a
+    single UPDATE when the block exits, the search reindexing into one per
+    profile and the project image releases into one release_all(). Bulk
+    writes that bypass the model signals (bulk_create/bulk_update) call
+    mark_profiles_changed with the search columns they change.
+    """
+    pending = set()
+    counts = defaultdict(Counter)
+    releases = []
+    search = defaultdict(set)
+    token = _pending_profile_ids.set(pending)
+    counts_token = _pending_counts.set(counts)
+    releases_token = _pending_releases.set(releases)
+    search_token = _pending_search.set(search)
+    try:
+        yield
+    finally:
+        _pending_profile_ids.reset(token)
+        _pending_counts.reset(counts_token)
+        _pending_releases.reset(releases_token)
+        _pending_search.reset(search_token)
+    if pending:
+        mark_profiles_changed(pending, counts, columns=())
+    # One reindex per distinct set of changed columns
+    groups = defaultdict(list)
+    for profile_id, columns in search.items():
+        groups[frozenset(columns)].append(profile_id)
+    for columns, ids in groups.items():
+        _index_profiles(ids, columns)
+    release_all(releases, on_delete=delete_variants)
+
+def _reindex(profile_ids, columns):
+    pending = _pending_search.get()
+    if pending is None:
+        _index_profiles(profile_ids, columns)
+        return
+    for profile_id in profile_ids:
+        pending[profile_id].update(columns)
+
+def _index_profiles(profile_ids, columns):
+    # The search columns, and the skill matching index when skills changed
+    profile_ids = set(profile_ids)
+    reindex_profiles(profile_ids, columns)
+    if 'skills' in columns:
+        transaction.on_commit(lambda: skill_index.refresh_profiles(profile_ids))
+
+def section_counts(model, profile_ids, delta=1):
+    """Counter changes for ``delta`` rows of ``model`` per profile id (repeats add up)"""
+    field = COUNTER_FIELDS[model._meta.get_field('profile').remote_field.related_name]
+    counts = defaultdict(Counter)
+    for profile_id in profile_ids:
+        counts[profile_id][field] += delta
+    return counts
+
+def moved_row_counts(model, rows):
+    """Counter changes for saved ``rows`` now belonging to another profile than when loaded"""
+    moved = [row for row in rows if getattr(row, '_loaded_profile_id', row.profile_id) != row.profile_id]
+    counts = section_counts(model, [row._loaded_profile_id for row in moved], -1)
+    for profile_id, changes in section_counts(model, [row.profile_id for row in moved]).items():
+        counts[profile_id].update(changes)
+    return counts
+
+def mark_profiles_changed(profile_ids, counts=None, columns=SEARCH_COLUMNS):
+    """
+    Advance updated_at (applying any section ``counts`` changes to the counter
+    columns in the same UPDATE), reindex the search ``columns`` and invalidate
+    the cached documents of the profiles.
+    """
+    profile_ids = set(profile_ids)
+    pending = _pending_profile_ids.get()
+    if pending is not None:
+        pending.update(profile_ids)
+        for profile_id, changes in (counts or {}).items():
+            _pending_counts.get()[profile_id].update(changes)
+        _reindex(profile_ids, columns)
+        return
+    # One UPDATE per distinct set of counter changes, usually just one
+    groups = defaultdict(list)
+    for profile_id in profile_ids:
+        changes = (counts or {}).get(profile_id, {})
+        groups[frozenset((field, delta) for field, delta in changes.items() if delta)].append(profile_id)
+    now = timezone.now()
+    for changes, ids in groups.items():
+        EmployeeProfile.objects.filter(id__in=ids).update(
+            updated_at=now, **{field: F(field) + delta for field, delta in changes}
+        )
+    _reindex(profile_ids, columns)
+    for profile_id in profile_ids:
+        _invalidate_on_commit(profile_id)
+
+def _cascaded_from(origin, *models):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in models
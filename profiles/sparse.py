@@ -0,0 +1,100 @@
+from rest_framework import permissions, serializers
+
+
+def parse_field_tree(value):
+    """
+    Parse ``?fields=id,position,skills.name`` into a nested dict
+    ``{'id': {}, 'position': {}, 'skills': {'name': {}}}``. An empty dict
+    means "every subfield". Returns None when the parameter is absent.
+    """
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, (p.strip() for p in path.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def prune_serializer(serializer, tree):
+    """Drop every field of ``serializer`` not selected by ``tree``"""
+    serializer = getattr(serializer, 'child', serializer)
+    if not tree:
+        return
+    for name in list(serializer.fields):
+        if name not in tree:
+            serializer.fields.pop(name)
+            continue
+        nested = serializer.fields[name]
+        nested = getattr(nested, 'child', nested)
+        if tree[name] and isinstance(nested, serializers.Serializer):
+            prune_serializer(nested, tree[name])
+
+
+def model_columns(model, names):
+    """The concrete model field names among ``names``, for ``only()``"""
+    concrete = {f.name for f in model._meta.concrete_fields}
+    return [name for name in names if name in concrete]
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset support for ``?fields=`` (sparse fieldsets, dotted for nested
+    fields) and ``?expand=`` (which ``expandable_fields`` to embed; the
+    others collapse to a primary key or are left out). Views use
+    ``is_requested``/``is_expanded`` to skip the joins and prefetches
+    for fields nobody asked for.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    expandable_fields = ()
+
+    @property
+    def field_tree(self):
+        if not hasattr(self, '_field_tree'):
+            self._field_tree = parse_field_tree(self.request.query_params.get(self.fields_query_param))
+        return self._field_tree
+
+    @property
+    def expand(self):
+        if not hasattr(self, '_expand'):
+            value = self.request.query_params.get(self.expand_query_param)
+            self._expand = None if value is None else {name.strip() for name in value.split(',')}
+        return self._expand
+
+    def has_sparse_fieldset(self):
+        return self.field_tree is not None or self.expand is not None
+
+    def is_requested(self, name):
+        return self.field_tree is None or name in self.field_tree
+
+    def is_expanded(self, name):
+        return self.is_requested(name) and (self.expand is None or name in self.expand)
+
+    def requested_subfields(self, name):
+        """Selected subfields of a nested field, or None for all of them"""
+        if self.field_tree is None or not self.field_tree.get(name):
+            return None
+        return list(self.field_tree[name])
+
+    def apply_sparse_fieldset(self, serializer):
+        target = getattr(serializer, 'child', serializer)
+        for name in self.expandable_fields:
+            if name not in target.fields or self.is_expanded(name):
+                continue
+            field = target.fields[name]
+            if isinstance(field, serializers.ListSerializer):
+                target.fields.pop(name)
+            else:
+                kwargs = {} if field.source == name else {'source': field.source}
+                target.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **kwargs)
+        prune_serializer(target, self.field_tree)
+        return serializer
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        # Writes keep their full input fields
+        if self.request.method not in permissions.SAFE_METHODS:
+            return serializer
+        return self.apply_sparse_fieldset(serializer)
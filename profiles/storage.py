@@ -0,0 +1,122 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+BLOB_PREFIX = 'blobs'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every upload after the SHA-256 of its
+    content (``blobs/ab/<digest>.<ext>``). The upload is hashed while it
+    streams to a temporary file next to its destination; if a blob with the
+    same digest already exists the copy is discarded, so a duplicate upload
+    costs one read and no extra disk space. Blob lifetime is tracked by
+    MediaBlob reference counts (see ``retain``/``release``): every save
+    takes one reference to the blob it returns, which the caller owns.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content and is chosen in _save()
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()
+        blob_dir = self.path(BLOB_PREFIX)
+        os.makedirs(blob_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        handle, temp_path = tempfile.mkstemp(dir=blob_dir, suffix='.upload')
+        try:
+            with os.fdopen(handle, 'wb') as temp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(HASH_CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            blob_name = f'{BLOB_PREFIX}/{hexdigest[:2]}/{hexdigest}{extension}'
+            full_path = self.path(blob_name)
+            # Referenced before the existence check: a deletion of this blob
+            # either finished already, and the file is written again, or
+            # waits for this transaction and then finds it referenced
+            retain(blob_name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return blob_name
+
+
+def project_image_storage():
+    return ContentAddressedStorage()
+
+
+def retain(name):
+    """Count one more reference to the stored file ``name``"""
+    from .models import MediaBlob
+    if not name:
+        return
+    if MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, ref_count=1)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release(name, on_delete=None):
+    """
+    Drop one reference to ``name``. When none remain the file is deleted
+    after commit, and ``on_delete(name)`` runs for derived files.
+    """
+    release_all([name], on_delete)
+
+
+def release_all(names, on_delete=None):
+    """release() for every name in ``names`` (repeats drop several references) in a fixed number of queries"""
+    from .models import MediaBlob
+    counts = Counter(name for name in names if name)
+    if not counts:
+        return
+    # One UPDATE however often each name repeats
+    released = Case(*(When(name=name, then=Value(times)) for name, times in counts.items()))
+    MediaBlob.objects.filter(name__in=counts).update(ref_count=Greatest(F('ref_count') - released, Value(0)))
+    # The rows stay at zero until _delete_unreferenced removes them
+    unreferenced = list(MediaBlob.objects.filter(name__in=counts, ref_count=0).values_list('name', flat=True))
+    if unreferenced:
+        transaction.on_commit(lambda: _delete_unreferenced(unreferenced, on_delete))
+
+
+def _delete_unreferenced(names, on_delete):
+    from .models import MediaBlob
+    with transaction.atomic():
+        # Deleting the rows first takes the write lock until the files are
+        # gone. A save of the same content that retained the blob before
+        # keeps its row; one that retains it meanwhile waits, finds no row
+        # and writes the file again (see ContentAddressedStorage._save).
+        MediaBlob.objects.filter(name__in=names, ref_count=0).delete()
+        kept = set(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        storage = project_image_storage()
+        for name in set(names) - kept:
+            storage.delete(name)
+            if on_delete is not None:
+                on_delete(name)
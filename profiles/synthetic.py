@@ -0,0 +1,81 @@
+"""
+Seeded synthetic CV data for benchmarks and local load testing. The same
+seed and sizes always produce the same users, profiles and sections.
+"""
+import datetime
+import random
+
+SEED_USERNAME_PREFIX = 'seed-'
+POSITIONS = (
+    'Backend Engineer', 'Frontend Engineer', 'Data Scientist', 'DevOps Engineer',
+    'Product Manager', 'QA Engineer', 'Mobile Developer', 'Security Analyst',
+)
+SKILLS = (
+    'Python', 'Django', 'PostgreSQL', 'React', 'TypeScript', 'Go', 'Rust', 'Kubernetes',
+    'Docker', 'AWS', 'Terraform', 'Java', 'Kotlin', 'Swift', 'SQL', 'Pandas', 'Spark',
+    'Redis', 'GraphQL', 'Linux', 'C++', 'Figma', 'Scrum', 'Machine Learning',
+)
+PROFICIENCIES = ('beginner', 'intermediate', 'advanced', 'expert')
+INSTITUTIONS = ('University of Tunis', 'ENIT', 'INSAT', 'Sorbonne', 'TU Munich', 'EPFL')
+DEGREES = ('BSc Computer Science', 'MSc Software Engineering', 'Engineering Degree', 'PhD')
+ISSUERS = ('AWS', 'Google Cloud', 'Microsoft', 'Linux Foundation', 'Oracle', 'Scrum Alliance')
+BASE_DATE = datetime.date(2024, 1, 1)
+
+
+def seed_username(index):
+    return f'{SEED_USERNAME_PREFIX}{index:06d}'
+
+
+def build_entry(rng, index, skills, projects, education, certifications):
+    """One import entry (see importing.insert_chunk) for the ``index``-th user"""
+    username = seed_username(index)
+    position = rng.choice(POSITIONS)
+    stack = rng.sample(SKILLS, min(skills, len(SKILLS)))
+    return {
+        'user': {
+            'username': username,
+            'email': f'{username}@example.com',
+            'first_name': f'First{index}',
+            'last_name': f'Last{index}',
+        },
+        'password': None,
+        'profile': {'position': position, 'bio': f'{position} working with {", ".join(stack[:3])}.'},
+        'sections': {
+            'skills': [{'name': name, 'prificiency': rng.choice(PROFICIENCIES)} for name in stack],
+            'projects': [
+                {
+                    'title': f'Project {index}-{n}',
+                    'description': f'Built with {" and ".join(rng.sample(stack, min(2, len(stack))))}.' if stack else '',
+                    'technologies_used': ', '.join(rng.sample(stack, min(3, len(stack)))),
+                    'project_url': '',
+                    'start_date': BASE_DATE - datetime.timedelta(days=rng.randrange(3650)),
+                    'end_date': None,
+                }
+                for n in range(projects)
+            ],
+            'education': [
+                {
+                    'institution': rng.choice(INSTITUTIONS),
+                    'degree': rng.choice(DEGREES),
+                    'start_year': datetime.date(rng.randrange(2000, 2020), 9, 1),
+                    'end_year': None,
+                }
+                for _ in range(education)
+            ],
+            'certifications': [
+                {
+                    'title': f'{issuer} Certified',
+                    'issuer': issuer,
+                    'issued_date': BASE_DATE - datetime.timedelta(days=rng.randrange(1000)),
+                    'expiry_date': BASE_DATE + datetime.timedelta(days=rng.randrange(2000)),
+                }
+                for issuer in (rng.choice(ISSUERS) for _ in range(certifications))
+            ],
+        },
+    }
+
+
+def iter_entries(count, seed=0, skills=8, projects=3, education=2, certifications=2):
+    rng = random.Random(seed)
+    for index in range(count):
+        yield build_entry(rng, index, skills, projects, education, certifications)
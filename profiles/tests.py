@@ -1,3 +1,1226 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import warnings
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import async_views, checks, media, profiling, routing, tokens
+from .authentication import tokens_for_user
+from .images import IMAGE_VARIANTS, delete_variants, process_project_image, render_variant, variant_path
+from .instrumentation import QueryBudgetExceeded, RequestMetricsMiddleware
+from .matching import skill_index
+from .models import COUNTER_FIELDS, Certification, Education, EmployeeProfile, MediaBlob, Project, Skill
+from .pagination import KeysetPagination
+from .search import drop_profiles
+from .storage import project_image_storage, release, release_all, retain
+from .synthetic import seed_username
+
+PASSWORD = 'benchmark-password'
+
+
+class SeededAPITestCase(APITestCase):
+    """
+    Users with full CVs from the seed_profiles command (the dataset the API
+    benchmark runs against), authenticated as the first one with a JWT.
+    """
+    seed_options = {'users': 3, 'skills': 4, 'projects': 2, 'education': 1, 'certifications': 2}
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_profiles', seed=1, password=PASSWORD, stdout=StringIO(), **cls.seed_options)
+        cls.user = User.objects.get(username=seed_username(0))
+        cls.profile = cls.user.profiles.get()
+        cls.other_user = User.objects.get(username=seed_username(1))
+        cls.other_profile = cls.other_user.profiles.get()
+
+    def setUp(self):
+        cache.clear()
+        self.authenticate(self.user)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+    def counts(self, profile):
+        profile = EmployeeProfile.objects.get(pk=profile.pk)
+        return {field: getattr(profile, field) for field in COUNTER_FIELDS.values()}
+
+
+class SeedProfilesTests(SeededAPITestCase):
+    def test_seeds_profiles_with_sections(self):
+        self.assertEqual(EmployeeProfile.objects.count(), 3)
+        self.assertEqual(self.profile.skills.count(), 4)
+        self.assertEqual(self.profile.projects.count(), 2)
+        self.assertTrue(self.user.check_password(PASSWORD))
+        self.assertFalse(self.other_user.has_usable_password())
+
+    def test_rerun_only_fills_gaps(self):
+        out = StringIO()
+        call_command('seed_profiles', seed=1, stdout=out, users=4)
+        self.assertIn('Seeded 1 profiles', out.getvalue())
+        self.assertEqual(EmployeeProfile.objects.count(), 4)
+
+    def test_benchmark_reports_every_scenario(self):
+        out = StringIO()
+        call_command('benchmark_api', '--iterations=2', '--warmup=0', '--host=testserver', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset']['profiles'], 3)
+        self.assertIn('profiles.detail', report['scenarios'])
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['status_codes'], {'200': 2}, name)
+
+
+class ProfileListTests(SeededAPITestCase):
+    def test_list_reads_counter_columns(self):
+        response = self.client.get('/api/profiles/')
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.data['results'] if row['id'] == self.profile.id)
+        self.assertEqual(
+            {field: row[field] for field in COUNTER_FIELDS.values()},
+            {'skills_count': 4, 'education_count': 1, 'certifications_count': 2, 'projects_count': 2},
+        )
+
+    def test_counters_follow_section_writes(self):
+        response = self.client.post('/api/skills/', {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'beginner'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(self.profile)['skills_count'], 5)
+        self.client.delete(f'/api/skills/{response.data["id"]}/')
+        self.client.delete(f'/api/projects/{self.profile.projects.first().id}/')
+        self.assertEqual(self.counts(self.profile)['skills_count'], 4)
+        self.assertEqual(self.counts(self.profile)['projects_count'], 1)
+
+    def test_counter_ordering_and_filters(self):
+        Skill.objects.create(profile=self.other_profile, name='Zig', prificiency='beginner')
+        response = self.client.get('/api/profiles/?ordering=-skills_count')
+        self.assertEqual(response.data['results'][0]['id'], self.other_profile.id)
+        response = self.client.get('/api/profiles/?skills_count__gte=5')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.other_profile.id])
+        response = self.client.get('/api/profiles/?skills_count__lte=4&projects_count__gte=2')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_rejects_unknown_ordering_and_bad_bounds(self):
+        self.assertEqual(self.client.get('/api/profiles/?ordering=bio').status_code, 400)
+        self.assertEqual(self.client.get('/api/profiles/?skills_count__gte=-1').status_code, 400)
+        self.assertEqual(self.client.get('/api/profiles/?skills_count__gte=x').status_code, 400)
+
+    def test_repair_command_recounts_drifted_profiles(self):
+        EmployeeProfile.objects.filter(pk=self.profile.pk).update(skills_count=40)
+        out = StringIO()
+        call_command('repair_profile_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 1 of 3 profiles', out.getvalue())
+        self.assertEqual(self.counts(self.profile)['skills_count'], 40)
+        call_command('repair_profile_counters', stdout=StringIO())
+        self.assertEqual(self.counts(self.profile)['skills_count'], 4)
+
+    def test_list_queries_do_not_grow_with_profiles(self):
+        self.client.get('/api/profiles/')
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/api/profiles/')
+        call_command('seed_profiles', seed=1, stdout=StringIO(), users=6)
+        with self.assertNumQueries(len(few)):
+            response = self.client.get('/api/profiles/')
+        self.assertEqual(len(response.data['results']), EmployeeProfile.objects.count())
+
+
+class AsyncReadTests(SeededAPITestCase):
+    def call(self, view, path, headers=None, **kwargs):
+        request = APIRequestFactory().get(
+            path, HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}', **(headers or {})
+        )
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_detail_matches_the_drf_document(self):
+        url = f'/api/profiles/{self.profile.id}/'
+        response = self.call(async_views.profile_detail, url, pk=str(self.profile.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(self.client.get(url).content))
+
+    def test_my_profile_answers_conditional_gets(self):
+        response = self.call(async_views.my_profile, '/api/profiles/my_profile/')
+        self.assertEqual(json.loads(response.content)['id'], self.profile.id)
+        not_modified = self.call(
+            async_views.my_profile, '/api/profiles/my_profile/', headers={'HTTP_IF_NONE_MATCH': response['ETag']}
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_nested_sections_and_declined_requests(self):
+        url = f'/api/profiles/{self.profile.id}/skills/'
+        response = self.call(async_views.profile_skills, url, profile_id=self.profile.id)
+        self.assertEqual(json.loads(response.content), json.loads(self.client.get(url).content))
+        # Parameters the async list does not handle go to the DRF view
+        self.assertIsNone(self.call(async_views.profile_list, '/api/profiles/?fields=id'))
+
+    def test_requires_authentication(self):
+        request = APIRequestFactory().get('/api/profiles/my_profile/')
+        self.assertEqual(async_to_sync(async_views.my_profile)(request).status_code, 401)
+
+    def test_list_pages_in_the_sync_view_order(self):
+        # Later ids joined earlier, so the join date order is not the id order
+        now = timezone.now()
+        for age, profile in enumerate(EmployeeProfile.objects.order_by('id')):
+            EmployeeProfile.objects.filter(pk=profile.pk).update(joined_at=now - datetime.timedelta(days=age))
+        response = self.call(async_views.profile_list, '/api/profiles/')
+        self.assertEqual(response.status_code, 200)
+        expected = [row['id'] for row in self.client.get('/api/profiles/').data['results']]
+        self.assertEqual([row['id'] for row in json.loads(response.content)['results']], expected)
+        self.assertEqual(expected, sorted(expected, reverse=True))
+
+
+class CursorPaginationTests(SeededAPITestCase):
+    seed_options = {**SeededAPITestCase.seed_options, 'users': 45}
+
+    def collect(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url, pages = response.data['next'], pages + 1
+        return ids, pages
+
+    def test_walks_every_profile_once_in_keyset_order(self):
+        ids, pages = self.collect('/api/profiles/?pagination=cursor')
+        self.assertEqual(pages, 3)
+        expected = list(EmployeeProfile.objects.order_by('joined_at', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_pages_by_counter_ordering(self):
+        ids, _ = self.collect('/api/profiles/?pagination=cursor&ordering=-skills_count')
+        self.assertEqual(sorted(ids), sorted(EmployeeProfile.objects.values_list('id', flat=True)))
+
+    @mock.patch.object(KeysetPagination, 'page_size', 250)
+    def test_walks_past_a_thousand_tied_counters(self):
+        owner = User.objects.create(username='bulk-owner')
+        EmployeeProfile.objects.bulk_create(EmployeeProfile(owner=owner, position='Tester') for _ in range(1100))
+        expected = list(EmployeeProfile.objects.order_by('-skills_count', '-id').values_list('id', flat=True))
+        self.assertGreater(EmployeeProfile.objects.filter(skills_count=0).count(), 1000)
+        ids, pages = self.collect('/api/profiles/?pagination=cursor&ordering=-skills_count')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 5)
+        # Stepping back from the last page lands on the one before it
+        url = '/api/profiles/?pagination=cursor&ordering=-skills_count'
+        for _ in range(4):
+            url = self.client.get(url).data['next']
+        previous = self.client.get(self.client.get(url).data['previous']).data
+        self.assertEqual([row['id'] for row in previous['results']], expected[750:1000])
+
+    def test_rejects_malformed_cursors(self):
+        for position in ('5', '[5]', '[5,'):
+            cursor = base64.b64encode(f'p={position}'.encode()).decode()
+            self.assertEqual(self.client.get(f'/api/profiles/?cursor={cursor}').status_code, 404, position)
+
+    def test_count_is_opt_in(self):
+        response = self.client.get('/api/profiles/?pagination=cursor&count=true')
+        self.assertEqual(response.data['count'], 45)
+
+    def test_section_cursor_pages(self):
+        response = self.client.get(f'/api/skills/?pagination=cursor&profile={self.profile.id}')
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNone(response.data['next'])
+
+    def test_page_numbers_stay_the_default(self):
+        response = self.client.get('/api/profiles/?page=3')
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_section_pages_are_in_id_order(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            for section in ('skills', 'education', 'certifications', 'projects'):
+                ids = [row['id'] for row in self.client.get(f'/api/{section}/').data['results']]
+                self.assertEqual(ids, sorted(ids), section)
+
+
+class ProfileDetailTests(SeededAPITestCase):
+    def detail_url(self):
+        return f'/api/profiles/{self.profile.id}/'
+
+    def test_second_read_is_served_from_cache(self):
+        with CaptureQueriesContext(connection) as cold:
+            first = self.client.get(self.detail_url())
+        with CaptureQueriesContext(connection) as warm:
+            second = self.client.get(self.detail_url())
+        self.assertEqual(first.data, second.data)
+        self.assertLess(len(warm), len(cold))
+
+    def test_section_write_invalidates_cached_document(self):
+        self.client.get(self.detail_url())
+        skill = self.profile.skills.first()
+        # Cached documents are invalidated once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/skills/{skill.id}/', {'name': 'Elixir'})
+        self.assertEqual(response.status_code, 200)
+        names = [row['name'] for row in self.client.get(self.detail_url()).data['skills']]
+        self.assertIn('Elixir', names)
+
+    def test_owner_change_invalidates_cached_document(self):
+        self.client.get(self.detail_url())
+        self.user.first_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(self.detail_url()).data['owner']['first_name'], 'Renamed')
+
+    def test_conditional_get(self):
+        response = self.client.get(self.detail_url())
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        not_modified = self.client.get(self.detail_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        self.client.post('/api/skills/', {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'x'})
+        changed = self.client.get(self.detail_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_conditional_section_reads(self):
+        for url in (f'/api/profiles/{self.profile.id}/skills/', '/api/profiles/my_profile/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class SparseFieldsetTests(SeededAPITestCase):
+    def test_list_fields(self):
+        response = self.client.get('/api/profiles/?fields=id,position')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'position'})
+
+    def test_detail_nested_fields(self):
+        response = self.client.get(f'/api/profiles/{self.profile.id}/?fields=id,skills.name')
+        self.assertEqual(set(response.data), {'id', 'skills'})
+        self.assertEqual([set(row) for row in response.data['skills']], [{'name'}] * 4)
+
+    def test_expand_collapses_other_relations(self):
+        response = self.client.get(f'/api/profiles/{self.profile.id}/?expand=skills')
+        self.assertEqual(response.data['owner'], self.user.id)
+        self.assertEqual(len(response.data['skills']), 4)
+        self.assertNotIn('projects', response.data)
+
+
+class BulkSectionTests(SeededAPITestCase):
+    def test_bulk_create_update_delete(self):
+        items = [{'profile': self.profile.id, 'name': f'Lang{n}', 'prificiency': 'x'} for n in range(3)]
+        response = self.client.post('/api/skills/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [row['id'] for row in response.data]
+        self.assertEqual(self.counts(self.profile)['skills_count'], 7)
+
+        response = self.client.patch('/api/skills/bulk/', [{'id': pk, 'prificiency': 'expert'} for pk in ids], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Skill.objects.filter(id__in=ids, prificiency='expert').count(), 3)
+
+        response = self.client.delete('/api/skills/bulk/', ids, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.counts(self.profile)['skills_count'], 4)
+
+    def test_batch_is_all_or_nothing(self):
+        items = [
+            {'profile': self.profile.id, 'name': 'Ok', 'prificiency': 'x'},
+            {'profile': self.profile.id, 'prificiency': 'x'},
+            {'profile': self.other_profile.id, 'name': 'Theirs', 'prificiency': 'x'},
+        ]
+        response = self.client.post('/api/skills/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['errors']
+        self.assertEqual(errors[0], {})
+        self.assertIn('name', errors[1])
+        self.assertIn('profile', errors[2])
+        self.assertFalse(Skill.objects.filter(name='Ok').exists())
+
+    def test_cannot_touch_other_users_rows(self):
+        theirs = self.other_profile.skills.first()
+        response = self.client.delete('/api/skills/bulk/', [theirs.id], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Skill.objects.filter(pk=theirs.pk).exists())
+
+
+class DocumentUpsertTests(SeededAPITestCase):
+    def document(self):
+        return self.client.get('/api/profiles/my_profile/').data
+
+    def test_put_writes_only_changed_rows(self):
+        document = self.document()
+        skills = [{'id': row['id'], 'name': row['name'], 'prificiency': row['prificiency']} for row in document['skills']]
+        skills[0]['name'] = 'Renamed'
+        payload = {'position': document['position'], 'skills': skills[:3] + [{'name': 'New', 'prificiency': 'x'}]}
+        response = self.client.put('/api/profiles/my_profile/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changes'], {'skills': {'created': 1, 'updated': 1, 'deleted': 1}})
+        self.assertEqual(self.counts(self.profile)['skills_count'], 4)
+
+        payload['skills'] = [
+            {'id': row['id'], 'name': row['name'], 'prificiency': row['prificiency']} for row in response.data['skills']
+        ]
+        response = self.client.put('/api/profiles/my_profile/', payload, format='json')
+        self.assertEqual(response.data['changes'], {'skills': {'created': 0, 'updated': 0, 'deleted': 0}})
+
+    def test_sections_missing_from_payload_are_kept(self):
+        response = self.client.patch(f'/api/profiles/{self.profile.id}/document/', {'bio': 'Short'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bio'], 'Short')
+        self.assertEqual(len(response.data['skills']), 4)
+
+    def test_patch_updates_existing_rows_partially(self):
+        skill = self.profile.skills.first()
+        response = self.client.patch(
+            '/api/profiles/my_profile/', {'skills': [{'id': skill.id, 'prificiency': 'expert'}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        skill.refresh_from_db()
+        self.assertEqual((skill.prificiency, skill.name), ('expert', skill.name))
+
+    def test_patch_requires_every_field_of_new_rows(self):
+        skill = self.profile.skills.first()
+        payload = {
+            'bio': 'Not saved',
+            'skills': [{'id': skill.id, 'prificiency': 'expert'}, {'level': 'x'}, {'id': 999999, 'name': 'Go'}],
+        }
+        response = self.client.patch('/api/profiles/my_profile/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['skills']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(sorted(errors[1]), ['name', 'prificiency'])
+        self.assertEqual(sorted(errors[2]), ['prificiency'])
+        # Nothing from the rejected document was written
+        self.assertNotEqual(EmployeeProfile.objects.get(pk=self.profile.pk).bio, 'Not saved')
+        self.assertEqual(self.counts(self.profile)['skills_count'], 4)
+
+        response = self.client.patch(
+            f'/api/profiles/{self.profile.id}/document/',
+            {'projects': [{'title': 'No dates', 'description': 'x', 'technologies_used': 'x'}]}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['projects'][0]), ['start_date'])
+
+    def test_only_owner_may_save(self):
+        response = self.client.put(f'/api/profiles/{self.other_profile.id}/document/', {'position': 'x'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class SearchAndMatchTests(SeededAPITestCase):
+    def test_search_ranks_matching_profiles(self):
+        skill = self.profile.skills.first().name
+        response = self.client.get('/api/profiles/search/', {'q': skill})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.profile.id, [row['id'] for row in response.data['results']])
+        self.assertEqual(self.client.get('/api/profiles/search/').status_code, 400)
+
+    def test_search_sees_section_changes(self):
+        Skill.objects.create(profile=self.other_profile, name='Brainfuck', prificiency='expert')
+        response = self.client.get('/api/profiles/search/', {'q': 'brainfuck'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.other_profile.id])
+
+    def test_section_writes_reindex_only_their_column(self):
+        skill = self.other_profile.skills.first()
+        skill.name = 'Brainfuck'
+        with CaptureQueriesContext(connection) as queries:
+            skill.save()
+        statements = [query['sql'] for query in queries]
+        search = [sql for sql in statements if 'profiles_search' in sql]
+        self.assertEqual(len(search), 1)
+        self.assertIn('SET skills = ', search[0])
+        self.assertFalse([sql for sql in statements if 'profiles_education' in sql])
+
+        for query in ('brainfuck', self.other_profile.position):
+            response = self.client.get('/api/profiles/search/', {'q': query})
+            self.assertIn(self.other_profile.id, [row['id'] for row in response.data['results']])
+
+    def test_match_ranks_by_required_skills(self):
+        skill_index.rebuild()
+        skill = self.profile.skills.first()
+        response = self.client.get('/api/profiles/match/', {'skills': skill.name, 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        matched = {row['profile']['id'] for row in response.data}
+        self.assertIn(self.profile.id, matched)
+        self.assertTrue(all(row['score'] > 0 for row in response.data))
+
+        response = self.client.post('/api/profiles/match/', {'skills': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_match_sees_skill_changes_after_commit(self):
+        skill_index.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(profile=self.other_profile, name='Brainfuck', prificiency='expert')
+        response = self.client.get('/api/profiles/match/', {'skills': 'brainfuck'})
+        self.assertEqual([row['profile']['id'] for row in response.data], [self.other_profile.id])
+
+
+class AuthenticationTests(SeededAPITestCase):
+    def login(self):
+        response = self.client.post('/api/auth/login/', {'username': self.user.username, 'password': PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cached_user_resolution(self):
+        self.client.get('/api/auth/user/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/user/')
+        self.assertEqual(response.data['username'], self.user.username)
+
+    def test_deactivation_takes_effect_immediately(self):
+        self.client.get('/api/auth/user/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+    def test_claims_only_view_skips_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/test/')
+        self.assertEqual(response.data['user'], self.user.username)
+
+    def test_logout_revokes_refresh_token(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': tokens['refresh']}).status_code, 200)
+        response = self.client.post('/api/auth/logout/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': tokens['refresh']}).status_code, 401)
+
+    def test_logout_on_another_worker_revokes_at_once(self):
+        # Each worker process has its own LocMemCache
+        worker_a, worker_b = LocMemCache('worker-a', {}), LocMemCache('worker-b', {})
+        pair = self.login()
+        with mock.patch.object(tokens, 'cache', worker_a):
+            self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': pair['refresh']}).status_code, 200)
+        with mock.patch.object(tokens, 'cache', worker_b):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {pair["access"]}')
+            self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': pair['refresh']}).status_code, 200)
+        with mock.patch.object(tokens, 'cache', worker_a):
+            self.assertEqual(self.client.post('/api/auth/refresh/', {'refresh': pair['refresh']}).status_code, 401)
+
+    def test_blacklisted_state_is_cached(self):
+        pair = self.login()
+        tokens.CachedBlacklistRefreshToken(pair['refresh']).blacklist()
+        with self.assertNumQueries(0), self.assertRaises(TokenError):
+            tokens.CachedBlacklistRefreshToken(pair['refresh'])
+
+    def test_shared_cache_answers_not_blacklisted(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+        # Two worker processes reading the same files
+        worker_a, worker_b = FileBasedCache(location, {}), FileBasedCache(location, {})
+        pair = self.login()
+        with override_settings(CACHES=shared):
+            with mock.patch.object(tokens, 'cache', worker_a):
+                tokens.CachedBlacklistRefreshToken(pair['refresh'])
+                with self.assertNumQueries(0):
+                    tokens.CachedBlacklistRefreshToken(pair['refresh'])
+            with mock.patch.object(tokens, 'cache', worker_b):
+                self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {pair["access"]}')
+                self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': pair['refresh']}).status_code, 200)
+            with mock.patch.object(tokens, 'cache', worker_a), self.assertNumQueries(0):
+                with self.assertRaises(TokenError):
+                    tokens.CachedBlacklistRefreshToken(pair['refresh'])
+
+    def test_prune_command_deletes_expired_tokens(self):
+        self.login()
+        live = OutstandingToken.objects.count()
+        expired = OutstandingToken.objects.create(
+            user=self.user, jti='expired', token='x', expires_at=timezone.now() - datetime.timedelta(days=1)
+        )
+        BlacklistedToken.objects.create(token=expired)
+        call_command('prune_token_blacklist', '--pause=0', stdout=StringIO())
+        self.assertFalse(OutstandingToken.objects.filter(pk=expired.pk).exists())
+        self.assertEqual(OutstandingToken.objects.count(), live)
+
+
+class MediaTests(SeededAPITestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = project_image_storage()
+
+    def png(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), color).save(buffer, 'PNG')
+        return SimpleUploadedFile(f'{color}.png', buffer.getvalue(), content_type='image/png')
+
+    def upload(self, method, url, data):
+        # The job is queued on commit; run it here instead of on the pool
+        with mock.patch('profiles.images.get_executor') as executor, self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='multipart')
+        self.assertLess(response.status_code, 300)
+        (_, project_id), _ = executor.return_value.submit.call_args
+        process_project_image(project_id)
+        return Project.objects.get(pk=project_id)
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.storage.save('projects/a.png', ContentFile(b'same bytes'))
+        second = self.storage.save('projects/b.png', ContentFile(b'same bytes'))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^blobs/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+    def test_blob_deleted_with_last_reference(self):
+        # Saving took the first reference
+        name = self.storage.save('projects/a.png', ContentFile(b'bytes'))
+        retain(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name)
+        self.assertTrue(self.storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_variants_are_generated_after_commit(self):
+        project = self.upload('post', '/api/projects/', {
+            'profile': self.profile.id, 'title': 'Atlas', 'description': 'Maps', 'technologies_used': 'Python',
+            'start_date': '2024-01-01', 'image': self.png('teal'),
+        })
+        self.assertEqual(set(project.image_variants), {*IMAGE_VARIANTS, 'source'})
+        sizes = {'thumb': (320, 240), 'medium': (640, 480)}
+        for variant, size in sizes.items():
+            with default_storage.open(project.image_variants[variant]) as handle, Image.open(handle) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', size))
+
+        replaced = self.upload('patch', f'/api/projects/{project.id}/', {'image': self.png('red')})
+        self.assertEqual(replaced.image_variants['source'], replaced.image.name)
+        for variant in IMAGE_VARIANTS:
+            self.assertFalse(default_storage.exists(project.image_variants[variant]))
+            self.assertTrue(default_storage.exists(replaced.image_variants[variant]))
+
+    def test_processing_changes_the_project_etag(self):
+        project = Project.objects.create(
+            profile=self.profile, title='Atlas', description='Maps', technologies_used='Python',
+            start_date=datetime.date(2024, 1, 1), image=self.png('teal'),
+        )
+        url = f'/api/projects/{project.id}/'
+        before = self.client.get(url)
+        self.assertFalse(before.data['image_variants'])
+        process_project_image(project.id)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['image_variants']), set(IMAGE_VARIANTS))
+
+    def test_projects_share_and_release_image_blobs(self):
+        data = {
+            'profile': self.profile.id, 'title': 'Atlas', 'description': 'Maps', 'technologies_used': 'Python',
+            'start_date': '2024-01-01',
+        }
+        first = self.upload('post', '/api/projects/', {**data, 'image': self.png('teal')})
+        second = self.upload('post', '/api/projects/', {**data, 'image': self.png('teal')})
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+        # Uploading the stored content again keeps the count
+        with mock.patch('profiles.images.get_executor'), self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/projects/{first.id}/', {'image': self.png('teal')}, format='multipart')
+        self.assertEqual(MediaBlob.objects.get(name=first.image.name).ref_count, 2)
+
+        for project_id in (first.id, second.id):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(f'/api/projects/{project_id}/')
+        self.assertFalse(self.storage.exists(first.image.name))
+        for variant in IMAGE_VARIANTS:
+            self.assertFalse(default_storage.exists(first.image_variants[variant]))
+
+    def test_blob_reused_before_deletion_is_kept(self):
+        name = self.storage.save('projects/a.png', ContentFile(b'bytes'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            release(name)
+            self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 0)
+            # The same content is uploaded again before the deletion runs
+            self.storage.save('projects/b.png', ContentFile(b'bytes'))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            release(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_deletion_during_a_duplicate_upload_keeps_the_file(self):
+        name = self.storage.save('projects/a.png', ContentFile(b'bytes'))
+        with self.captureOnCommitCallbacks() as callbacks:
+            release(name)
+        exists = os.path.exists
+
+        def delete_then_check(path):
+            # The pending deletion runs just before the upload looks for the file
+            while callbacks:
+                callbacks.pop()()
+            return exists(path)
+        with mock.patch('profiles.storage.os.path.exists', delete_then_check):
+            self.assertEqual(self.storage.save('projects/b.png', ContentFile(b'bytes')), name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 1)
+
+    def test_release_all_drops_every_reference_at_once(self):
+        shared = self.storage.save('projects/a.png', ContentFile(b'shared'))
+        single = self.storage.save('projects/b.png', ContentFile(b'single'))
+        kept = self.storage.save('projects/c.png', ContentFile(b'kept'))
+        for name in (shared, kept):
+            retain(name)
+        # The same queries as for one name, deletion included
+        with self.assertNumQueries(6), self.captureOnCommitCallbacks(execute=True):
+            release_all([shared, single, shared, kept])
+        self.assertEqual(list(MediaBlob.objects.values_list('name', 'ref_count')), [(kept, 1)])
+        self.assertFalse(self.storage.exists(shared) or self.storage.exists(single))
+        self.assertTrue(self.storage.exists(kept))
+
+    def test_variants_are_keyed_by_the_full_blob_name(self):
+        png = self.storage.save('projects/a.png', ContentFile(b'same bytes'))
+        jpg = self.storage.save('projects/a.jpg', ContentFile(b'same bytes'))
+        for source in (png, jpg):
+            for variant in IMAGE_VARIANTS:
+                default_storage.save(variant_path(source, variant), ContentFile(b'variant'))
+        delete_variants(png)
+        for variant in IMAGE_VARIANTS:
+            self.assertFalse(default_storage.exists(variant_path(png, variant)))
+            self.assertTrue(default_storage.exists(variant_path(jpg, variant)))
+
+    def test_concurrent_variant_jobs_write_one_file_each(self):
+        project = Project.objects.create(
+            profile=self.profile, title='Atlas', description='Maps', technologies_used='Python',
+            start_date=datetime.date(2024, 1, 1), image=self.png('teal'),
+        )
+        # Another job stores each variant while this one is rendering it
+        def render_alongside(image, width, height, crop):
+            variant = next(name for name, size in IMAGE_VARIANTS.items() if size == (width, height, crop))
+            default_storage.save(variant_path(project.image.name, variant), ContentFile(b'other job'))
+            return render_variant(image, width, height, crop)
+        with mock.patch('profiles.images.render_variant', render_alongside):
+            process_project_image(project.id)
+        project.refresh_from_db()
+        expected = {variant: variant_path(project.image.name, variant) for variant in IMAGE_VARIANTS}
+        self.assertEqual(project.image_variants, {**expected, 'source': project.image.name})
+        self.assertEqual(
+            sorted(default_storage.listdir('projects/variants')[1]),
+            sorted(os.path.basename(path) for path in expected.values()),
+        )
+        with default_storage.open(expected['thumb']) as handle, Image.open(handle) as image:
+            self.assertEqual(image.size, IMAGE_VARIANTS['thumb'][:2])
+
+    def test_serves_ranges_and_validators(self):
+        name = self.storage.save('projects/a.txt', ContentFile(b'0123456789'))
+        url = f'/media/{name}'
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        partial = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(partial.streaming_content), b'2345')
+        self.assertEqual(b''.join(self.client.get(url, HTTP_RANGE='bytes=-3').streaming_content), b'789')
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=20-').status_code, 416)
+        stale = self.client.get(url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/media/blobs/missing.png').status_code, 404)
+        self.assertIn(self.client.get('/media/../settings.py').status_code, (400, 404))
+
+    def test_hands_transfers_to_the_proxy(self):
+        name = self.storage.save('projects/a.txt', ContentFile(b'0123456789'))
+        with mock.patch.object(media, 'SENDFILE_BACKEND', 'x-accel-redirect'):
+            response = self.client.get(f'/media/{name}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{name}')
+        self.assertEqual(response.content, b'')
+
+
+class ExportImportTests(SeededAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+
+    def test_export_streams_every_profile(self):
+        response = self.client.get('/api/profiles/export/')
+        self.assertEqual(response.status_code, 200)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(records), 3)
+        mine = next(record for record in records if record['id'] == self.profile.id)
+        self.assertEqual(len(mine['skills']), 4)
+
+        csv = b''.join(self.client.get('/api/profiles/export/?output=csv').streaming_content).decode()
+        self.assertEqual(len(csv.strip().splitlines()), 4)
+        self.assertEqual(self.client.get('/api/profiles/export/?output=xml').status_code, 400)
+
+    def test_export_is_staff_only(self):
+        self.authenticate(self.other_user)
+        self.assertEqual(self.client.get('/api/profiles/export/').status_code, 403)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_profiles', stdout=out)
+        ids = sorted(json.loads(line)['id'] for line in out.getvalue().splitlines())
+        self.assertEqual(ids, sorted(EmployeeProfile.objects.values_list('id', flat=True)))
+
+    def test_import_skips_existing_and_invalid_records(self):
+        out = StringIO()
+        call_command('export_profiles', stdout=out)
+        lines = out.getvalue().splitlines()
+        new = {
+            'username': 'imported', 'email': 'imported@example.com', 'password': 'import-password',
+            'position': 'Engineer', 'skills': [{'name': 'Go', 'prificiency': 'expert'}],
+        }
+        lines += [json.dumps(new), json.dumps({'username': 'broken', 'skills': [{'name': 'Go'}]})]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write('\n'.join(lines) + '\n')
+        self.addCleanup(os.remove, handle.name)
+
+        call_command('import_profiles', handle.name, '--workers=0', stdout=StringIO(), stderr=StringIO())
+        profile = EmployeeProfile.objects.get(owner__username='imported')
+        self.assertEqual(self.counts(profile)['skills_count'], 1)
+        self.assertTrue(profile.owner.check_password('import-password'))
+        self.assertFalse(User.objects.filter(username='broken').exists())
+        self.assertEqual(EmployeeProfile.objects.count(), 4)
+
+
+class ReplicaRoutingTests(SeededAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.aliases = []
+
+        def record(router, model, **hints):
+            # Test cases run inside a transaction, where the router always
+            # answers the primary; record where the request asked to read
+            self.aliases.append(routing._read_alias.get())
+            return None
+
+        for patcher in (
+            mock.patch.object(routing, 'replica_configured', return_value=True),
+            mock.patch.object(routing.ReplicaRouter, 'db_for_read', record),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_replica(self):
+        self.client.get('/api/skills/')
+        self.assertEqual(set(self.aliases), {routing.REPLICA_ALIAS})
+
+    def test_writer_reads_own_writes_from_primary(self):
+        self.client.post('/api/skills/', {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'x'})
+        self.aliases.clear()
+        self.client.get('/api/skills/')
+        self.assertEqual(set(self.aliases), {None})
+
+        # Other users are not pinned
+        self.authenticate(self.other_user)
+        self.aliases.clear()
+        self.client.get('/api/skills/')
+        self.assertEqual(set(self.aliases), {routing.REPLICA_ALIAS})
+
+    def test_detail_cache_is_filled_from_primary(self):
+        self.client.get(f'/api/profiles/{self.profile.id}/')
+        self.assertIn(None, self.aliases)
+
+    async def test_async_requests_are_routed_and_pinned(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(routing.ReplicaRoutingMiddleware(get_response)))
+        headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+        self.assertEqual((await self.async_client.get('/api/skills/', headers=headers)).status_code, 200)
+        self.assertEqual(set(self.aliases), {routing.REPLICA_ALIAS})
+        self.assertIsNone(routing._read_alias.get())
+
+        response = await self.async_client.post(
+            '/api/skills/', {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'x'}, headers=headers
+        )
+        self.assertEqual(response.status_code, 201)
+        self.aliases.clear()
+        await self.async_client.get('/api/skills/', headers=headers)
+        self.assertEqual(set(self.aliases), {None})
+
+    def test_async_reads_are_routed_like_the_drf_views(self):
+        url = f'/api/profiles/{self.profile.id}/'
+        view = async_views.async_read(resolve(url).func, async_views.profile_detail)
+        self.assertTrue(routing.replica_eligible('GET', view))
+
+        request = APIRequestFactory().get(url, HTTP_AUTHORIZATION=self.client._credentials['HTTP_AUTHORIZATION'])
+        token = routing._read_alias.set(routing.REPLICA_ALIAS)
+        try:
+            self.assertEqual(async_to_sync(view)(request, pk=str(self.profile.id)).status_code, 200)
+        finally:
+            routing._read_alias.reset(token)
+        # The validators come from the replica, the cached document from the primary
+        self.assertIn(routing.REPLICA_ALIAS, self.aliases)
+        self.assertIn(None, self.aliases)
+
+    def test_token_is_decoded_once_per_request(self):
+        decode = mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True, side_effect=JWTAuthentication.get_validated_token,
+        )
+        with decode as validated:
+            self.client.get('/api/skills/')
+            self.client.post('/api/skills/', {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'x'})
+        # Routed (GET) or pinned (POST), and authenticated, from one decode each
+        self.assertEqual(validated.call_count, 2)
+
+    def test_replica_requires_a_shared_cache(self):
+        self.assertEqual([error.id for error in checks.check_replica_pins_are_shared(None)], ['profiles.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tempfile.gettempdir()}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.check_replica_pins_are_shared(None), [])
+
+    def test_router(self):
+        router = routing.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Skill), 'default')
+        self.assertFalse(router.allow_migrate(routing.REPLICA_ALIAS, 'profiles'))
+
+
+class SQLiteProductionModeTests(SimpleTestCase):
+    def test_production_options_tune_the_connection(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # A scratch database outside the test databases, configured the way settings.py does
+        database = connections.configure_settings({'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+            'OPTIONS': dict(settings.SQLITE_PRODUCTION_OPTIONS),
+        }})['default']
+        scratch = SQLiteDatabaseWrapper(database, alias='scratch')
+        self.addCleanup(scratch.close)
+        pragmas = {}
+        with scratch.cursor() as cursor:
+            for name in ('journal_mode', 'synchronous', 'temp_store', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        # synchronous=NORMAL is 1, temp_store=MEMORY is 2
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2, 'busy_timeout': 20000})
+        self.assertEqual(scratch.transaction_mode, 'IMMEDIATE')
+
+
+class ExpiringCertificationTests(SeededAPITestCase):
+    def test_window_and_order(self):
+        today = timezone.localdate()
+        Certification.objects.all().delete()
+        soon = Certification.objects.create(
+            profile=self.profile, title='Soon', issuer='x', issued_date=today, expiry_date=today + datetime.timedelta(days=3)
+        )
+        later = Certification.objects.create(
+            profile=self.other_profile, title='Later', issuer='x', issued_date=today, expiry_date=today + datetime.timedelta(days=20)
+        )
+        Certification.objects.create(
+            profile=self.profile, title='Gone', issuer='x', issued_date=today, expiry_date=today - datetime.timedelta(days=1)
+        )
+        response = self.client.get('/api/certifications/expiring/?days=10')
+        self.assertEqual([row['id'] for row in response.data['results']], [soon.id])
+        response = self.client.get('/api/certifications/expiring/')
+        self.assertEqual([row['id'] for row in response.data['results']], [soon.id, later.id])
+        self.assertEqual(self.client.get('/api/certifications/expiring/?days=x').status_code, 400)
+        self.assertEqual(self.client.get('/api/certifications/expiring/?days=99999').status_code, 400)
+
+
+class QueryPlanTests(SeededAPITestCase):
+    """The indexes added for the hot reads are the ones SQLite scans for them"""
+
+    def plans(self, run, table):
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        plans = []
+        for query in queries.captured_queries:
+            if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                    plans.append(' | '.join(row[-1] for row in cursor.fetchall()))
+        self.assertTrue(plans)
+        return plans
+
+    def assertScans(self, index, plans):
+        for plan in plans:
+            self.assertIn(index, plan)
+            # Rows come in index order, without a sort step
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_expiring_certifications_range_scan(self):
+        for url in ('/api/certifications/expiring/', '/api/certifications/expiring/?pagination=cursor'):
+            plans = self.plans(lambda: self.client.get(url), 'profiles_certification')
+            self.assertScans('cert_expiry_date_id_idx', plans)
+
+    @mock.patch.object(KeysetPagination, 'page_size', 1)
+    def test_profile_list_orderings(self):
+        for ordering, index in (
+            ('joined_at', 'profile_joined_at_id_idx'),
+            ('-skills_count', 'profile_skills_count_idx'),
+            ('-projects_count', 'profile_projects_count_idx'),
+        ):
+            url = f'/api/profiles/?pagination=cursor&ordering={ordering}'
+            plans = self.plans(lambda: self.client.get(url), 'profiles_employeeprofile')
+            # The next page adds the keyset condition
+            url = self.client.get(url).data['next']
+            plans += self.plans(lambda: self.client.get(url), 'profiles_employeeprofile')
+            self.assertScans(index, plans)
+
+    def test_profile_projects(self):
+        for url in (f'/api/profiles/{self.profile.id}/projects/', '/api/projects/my_projects/'):
+            self.assertScans('project_profile_start_idx', self.plans(lambda: self.client.get(url), 'profiles_project'))
+
+    def test_skill_matching_reads_cover(self):
+        skill_index.rebuild()
+        plans = self.plans(lambda: skill_index.refresh_profiles([self.profile.id]), 'profiles_skill')
+        self.assertScans('COVERING INDEX skill_profile_name_idx', plans)
+
+
+class InstrumentationTests(SeededAPITestCase):
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('profiles.requests', 'INFO') as logs:
+            response = self.client.get('/api/skills/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[0-9.]+;desc="\d+ queries", serialize;dur=')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['endpoint'], 'SkillViewSet.list')
+        self.assertEqual(record['serializer'], 'SkillSerializer')
+        self.assertEqual(record['status'], 200)
+
+    def test_request_over_its_query_budget_fails(self):
+        with mock.patch('profiles.views.SkillViewSet.query_budgets', {'list': 1}), \
+                self.assertLogs('profiles.requests', 'WARNING'), \
+                self.assertRaisesMessage(QueryBudgetExceeded, 'SkillViewSet.list ran'):
+            self.client.get('/api/skills/')
+
+    async def test_async_requests_are_measured(self):
+        async def get_response(request):
+            pass
+        self.assertTrue(iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+        headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+        with self.assertLogs('profiles.requests', 'INFO') as logs:
+            response = await self.async_client.get('/api/skills/', headers=headers)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['endpoint'], 'SkillViewSet.list')
+        self.assertGreater(record['queries'], 0)
+        self.assertIn(f'desc="{record["queries"]} queries"', response['Server-Timing'])
+
+
+class QueryBudgetTests(APITransactionTestCase):
+    """
+    The worst-case writes stay within their query budgets, which
+    BudgetTestRunner enforces. Outside a test transaction the work each
+    request runs on commit (blob deletion, cache bumps) counts as well.
+    """
+
+    def setUp(self):
+        call_command('seed_profiles', seed=1, password=PASSWORD, stdout=StringIO(), **SeededAPITestCase.seed_options)
+        self.user = User.objects.get(username=seed_username(0))
+        self.profile = self.user.profiles.get()
+        self.second_profile = EmployeeProfile.objects.create(owner=self.user, position='Consultant')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        self.addCleanup(lambda: drop_profiles(EmployeeProfile.objects.values_list('id', flat=True)))
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        # Once built, the skill matching index is refreshed after every write
+        skill_index.rebuild()
+        # Variants are rendered off the request thread, outside its budget
+        patcher = mock.patch('profiles.images.get_executor')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, method, url, data=None, status=200, format='json'):
+        cache.clear()
+        response = getattr(self.client, method)(url, data, format=format)
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def image(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+        return SimpleUploadedFile('project.png', buffer.getvalue(), content_type='image/png')
+
+    def project(self, **data):
+        return {
+            'profile': self.profile.id, 'title': 'Atlas', 'description': 'Maps', 'technologies_used': 'Python',
+            'start_date': '2024-01-01', **data,
+        }
+
+    def test_project_image_lifecycle(self):
+        pk = self.send('post', '/api/projects/', self.project(image=self.image('red')), 201, 'multipart').data['id']
+        self.send('patch', f'/api/projects/{pk}/', {'image': self.image('blue')}, format='multipart')
+        self.send('patch', f'/api/projects/{pk}/', {'profile': self.second_profile.id, 'image': self.image('green')}, format='multipart')
+        self.send('put', f'/api/projects/{pk}/', self.project(image=self.image('red')), format='multipart')
+        self.send('delete', f'/api/projects/{pk}/', status=204)
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_bulk_delete_releases_images_together(self):
+        ids = [
+            self.send('post', '/api/projects/', self.project(image=self.image(color)), 201, 'multipart').data['id']
+            for color in ('red', 'green', 'blue', 'red')
+        ]
+        self.send('delete', '/api/projects/bulk/', ids, status=204)
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_moving_rows_between_own_profiles(self):
+        skill = self.profile.skills.first()
+        self.send('patch', f'/api/skills/{skill.id}/', {'profile': self.second_profile.id})
+        self.send('put', f'/api/skills/{skill.id}/', {'profile': self.profile.id, 'name': 'Go', 'prificiency': 'expert'})
+        ids = list(self.profile.certifications.values_list('id', flat=True))
+        self.send('patch', '/api/certifications/bulk/', [{'id': pk, 'profile': self.second_profile.id} for pk in ids])
+
+    def test_section_and_profile_writes(self):
+        skill = self.send('post', '/api/skills/', {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'x'}, 201)
+        self.send('delete', f'/api/skills/{skill.data["id"]}/', status=204)
+        rows = self.send('post', '/api/education/bulk/', [
+            {'profile': profile.id, 'institution': 'ETH', 'degree': 'MSc', 'start_year': '2015-09-01'}
+            for profile in (self.profile, self.second_profile)
+        ], 201).data
+        self.send('delete', '/api/education/bulk/', [row['id'] for row in rows], status=204)
+        self.send('put', f'/api/profiles/{self.profile.id}/', {'bio': 'Maps', 'position': 'Engineer'})
+        self.send('patch', f'/api/profiles/{self.profile.id}/', {'position': 'Staff Engineer'})
+        # The my_* actions expect a single profile
+        self.second_profile.delete()
+        for action in ('my_skills', 'my_education', 'my_certifications', 'my_projects'):
+            self.send('get', f'/api/{action.split("_")[1]}/{action}/')
+
+    def test_document_rewriting_every_section(self):
+        self.rewrite_every_section(f'/api/profiles/{self.profile.id}/document/')
+
+    def test_own_document_rewriting_every_section(self):
+        self.rewrite_every_section('/api/profiles/my_profile/')
+
+    def rewrite_every_section(self, url):
+        for color in ('red', 'green'):
+            self.send('post', '/api/projects/', self.project(image=self.image(color)), 201, 'multipart')
+        Skill.objects.create(profile=self.profile, name='Zig', prificiency='beginner')
+        document = self.send('get', f'/api/profiles/{self.profile.id}/').data
+        rows = {
+            'skills': {'name': 'Go', 'prificiency': 'expert'},
+            'education': {'institution': 'ETH', 'degree': 'MSc', 'start_year': '2015-09-01'},
+            'certifications': {'title': 'CKA', 'issuer': 'CNCF', 'issued_date': '2024-01-01'},
+            'projects': self.project(title='Relay'),
+        }
+        # Each section updates its first row, adds one and deletes the rest
+        for name, row in rows.items():
+            new = {key: value for key, value in row.items() if key != 'profile'}
+            document[name] = [{**document[name][0], **new}, new]
+        Education.objects.create(profile=self.profile, institution='MIT', degree='BSc', start_year=datetime.date(2010, 9, 1))
+        document['education'][0]['degree'] = 'PhD'
+        document['position'] = 'Staff Engineer'
+        for key in ('image', 'image_variants'):
+            document['projects'][0].pop(key, None)
+        self.send('put', url, document)
+        self.assertEqual(self.profile.skills.count(), 2)
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+class ProfilingTests(SeededAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir)
+
+    def test_sampled_request_is_captured(self):
+        with mock.patch.object(profiling, 'SAMPLE_RATE', 1.0), mock.patch.object(profiling, 'STORE_DIR', self.store_dir):
+            # Middleware is loaded per client, after the settings are patched
+            client = self.client_class()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+            client.get('/api/skills/')
+            client.get('/api/auth/user/')
+        store = profiling.CaptureStore(self.store_dir)
+        names = store.names()
+        self.assertEqual(len(names), 1)
+        record = store.load(names[0])
+        self.assertEqual(record['endpoint'], 'SkillViewSet.list')
+        self.assertEqual(record['reasons'], ['sampled'])
+        self.assertTrue(record['profile'])
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        with mock.patch.object(profiling, 'STORE_DIR', self.store_dir):
+            self.assertContains(self.client.get('/admin/captures/'), names[0])
+            self.assertEqual(self.client.get(f'/admin/captures/{names[0]}/').status_code, 200)
+
+    async def test_async_requests_are_captured(self):
+        async def get_response(request):
+            pass
+        headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+        with mock.patch.object(profiling, 'SAMPLE_RATE', 1.0), mock.patch.object(profiling, 'STORE_DIR', self.store_dir):
+            self.assertTrue(iscoroutinefunction(profiling.ProfilingMiddleware(get_response)))
+            await self.async_client_class().get('/api/skills/', headers=headers)
+        store = profiling.CaptureStore(self.store_dir)
+        record = store.load(store.names()[0])
+        self.assertEqual(record['endpoint'], 'SkillViewSet.list')
+        self.assertGreater(record['query_count'], 0)
+        # The view ran on the sync_to_async thread, where the profiler was enabled
+        self.assertIn('mixins.py', record['profile'])
+
+
+class BatchTests(SeededAPITestCase):
+    dashboard = [
+        '/api/auth/user/', '/api/profiles/my_profile/', '/api/skills/my_skills/',
+        '/api/education/my_education/', '/api/certifications/my_certifications/', '/api/projects/my_projects/',
+    ]
+
+    def test_dashboard_in_one_round_trip(self):
+        response = self.client.post('/api/batch/', [{'path': path} for path in self.dashboard], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.data], [200] * 6)
+        self.assertEqual(response.data[0]['body']['username'], self.user.username)
+        self.assertEqual(response.data[1]['body']['id'], self.profile.id)
+        self.assertEqual(len(response.data[2]['body']), 4)
+        self.assertIn('ETag', response.data[1]['headers'])
+
+    def test_sub_requests_run_in_order(self):
+        response = self.client.post('/api/batch/', [
+            {'method': 'post', 'path': '/api/skills/', 'body': {'profile': self.profile.id, 'name': 'Zig', 'prificiency': 'x'}},
+            {'path': '/api/profiles/?fields=id,skills_count&skills_count__gte=5'},
+            {'method': 'DELETE', 'path': '/api/skills/999999/'},
+            {'path': '/api/nowhere/'},
+        ], format='json')
+        self.assertEqual([item['status'] for item in response.data], [201, 200, 404, 404])
+        self.assertEqual(response.data[1]['body']['results'], [{'id': self.profile.id, 'skills_count': 5}])
+
+    def test_failing_sub_requests_answer_alone(self):
+        with mock.patch('profiles.views.SkillViewSet.list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('profiles.batch', 'ERROR'):
+            response = self.client.post('/api/batch/', [
+                {'path': '/media/missing.png'},
+                {'path': '/api/skills/'},
+                {'path': '/admin/login/'},
+                {'path': '/api/auth/user/'},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.data], [404, 500, 200, 200])
+        # The admin's template response is rendered before its body is read
+        self.assertIn('<form', response.data[2]['body'])
+
+    def test_conditional_sub_request(self):
+        etag = self.client.get('/api/profiles/my_profile/')['ETag']
+        response = self.client.post(
+            '/api/batch/', [{'path': '/api/profiles/my_profile/', 'headers': {'If-None-Match': etag}}], format='json'
+        )
+        self.assertEqual(response.data[0]['status'], 304)
+
+    def test_rejects_invalid_batches(self):
+        response = self.client.post('/api/batch/', [{'path': '/api/batch/'}, {'method': 'TRACE', 'path': '/'}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([sorted(error) for error in response.data['errors']], [['path'], ['method']])
+        self.assertEqual(self.client.post('/api/batch/', {'path': '/'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/batch/', [{'path': '/'}] * 21, format='json').status_code, 400)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/batch/', [], format='json').status_code, 401)
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .cache import is_shared
+
+_BLACKLISTED = 'blacklisted'
+_NOT_BLACKLISTED = 'not-blacklisted'
+
+
+def blacklist_cache_key(jti):
+    return f'jwt:blacklist:{jti}'
+
+
+def cache_blacklisted(jti, expires_at):
+    """Record that the token ``jti`` is blacklisted, replacing a cached "not blacklisted" """
+    lifetime = max(int(expires_at.timestamp() - timezone.now().timestamp()), 1)
+    cache.set(blacklist_cache_key(jti), _BLACKLISTED, lifetime)
+
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    Refresh token whose blacklisted state is answered from the cache,
+    falling back to the token_blacklist tables on a miss. Entries live until
+    the token expires, after which the signature check rejects it anyway.
+
+    "Blacklisted" can never become false again, so it is cached in any
+    backend. "Not blacklisted" is only cached when the backend is shared by
+    every worker process: blacklisting a token overwrites it there (see the
+    BlacklistedToken receiver in signals.py), while a per-process cache
+    would keep answering for a token another worker has just revoked.
+    """
+
+    def _remaining_lifetime(self):
+        return max(int(self.payload['exp'] - self.current_time.timestamp()), 1)
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        key = blacklist_cache_key(jti)
+        state = cache.get(key)
+        if state is None:
+            if BlacklistedToken.objects.filter(token__jti=jti).exists():
+                state = _BLACKLISTED
+                cache.set(key, state, self._remaining_lifetime())
+            else:
+                state = _NOT_BLACKLISTED
+                # add(), so a blacklisting stored meanwhile is not overwritten
+                if is_shared():
+                    cache.add(key, state, self._remaining_lifetime())
+        if state == _BLACKLISTED:
+            raise TokenError(_("Token is blacklisted"))
+
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedBlacklistRefreshToken
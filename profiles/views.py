@@ -1,54 +1,264 @@
+from datetime import timedelta
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
-from .models import EmployeeProfile, Skill, Education, Certification, Project
+from django.db.models import Prefetch
+from .models import EmployeeProfile, Skill, Education, Certification, Project, COUNTER_FIELDS, SECTIONS
 from .serializers import (
     EmployeeProfileSerializer, 
     EmployeeProfileDetailSerializer,
     EmployeeProfileListSerializer,
+    EmployeeProfileDocumentSerializer,
+    SkillMatchSerializer,
     SkillSerializer, 
     EducationSerializer, 
     CertificationSerializer, 
     ProjectSerializer
 )
 from .permissions import IsOwnerOrReadOnly, IsProfileOwnerOrReadOnly, CanEditOwnProfileOnly
+from .bulk import BulkSectionMixin
+from .cache import get_or_render_detail
+from .instrumentation import InstrumentedViewMixin, timed_serializer
+from .export import EXPORT_FORMATS, iter_export
+from .conditional import (
+    ConditionalRetrieveMixin,
+    conditional_get,
+    object_last_modified,
+    own_profile_last_modified,
+    profile_last_modified,
+)
+from .matching import proficiency_weight, skill_index
+from .search import ProfileSearchResults
+from .sparse import SparseFieldsetMixin, model_columns
 
-class EmployeeProfileViewSet(viewsets.ModelViewSet):
-    queryset = EmployeeProfile.objects.all().select_related('owner').prefetch_related(
-        'skills', 'education', 'certifications', 'projects'
-    )
+class EmployeeProfileViewSet(SparseFieldsetMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
+    queryset = EmployeeProfile.objects.all().select_related('owner')
     permission_classes = [IsAuthenticated, CanEditOwnProfileOnly]
+    # Columns the list accepts in ?ordering= (optionally with a '-' prefix)
+    # and, for the counters, in ?<column>__gte= / ?<column>__lte=
+    list_orderings = ('joined_at',) + tuple(COUNTER_FIELDS.values())
+    # Safe-method requests may read from the replica (see routing.py)
+    replica_reads = True
+    # Worst cases with a cold cache, including authentication and the work
+    # run on commit (such as refreshing a built skill index). Document writes
+    # peak when every section inserts, updates and deletes rows, and the
+    # deleted projects release images.
+    query_budgets = {
+        'list': 3,
+        'retrieve': 7,
+        'update': 5,
+        'partial_update': 5,
+        'document': 42,
+        'my_profile': 8,
+        'my_profile:put': 43,
+        'my_profile:patch': 43,
+        'search': 4,
+        'match': 3,
+    }
+    expandable_fields = ('owner',) + SECTIONS
 
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'search', 'match'):
             return EmployeeProfileListSerializer
         elif self.action == 'retrieve':
             return EmployeeProfileDetailSerializer
+        elif self.action in ('document', 'my_profile'):
+            return EmployeeProfileDocumentSerializer
         return EmployeeProfileSerializer
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
     def get_queryset(self):
-        # Return all profiles for viewing, but filtering will be handled by permissions
+        # Return all profiles for viewing, but filtering will be handled by permissions.
+        # Each action only loads what its serializer renders: the list reads
+        # the counter columns, only the detail view pays for the full prefetch.
+        if self.action in ('list', 'search', 'match'):
+            queryset = EmployeeProfile.objects.all()
+            if self.action == 'list':
+                queryset = self.filter_counts(queryset).order_by(*self.cursor_ordering)
+            return self.prune_profile_queryset(queryset)
+        if self.action == 'retrieve':
+            return self.get_detail_queryset()
         return self.queryset
 
-    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
-    def my_profile(self, request):
-        """Get current user's profile"""
+    @property
+    def cursor_ordering(self):
+        # ?ordering=-skills_count pages by that counter's index, ties by id
+        request = getattr(self, 'request', None)
+        if request is None or self.action != 'list':
+            return ('joined_at', 'id')
+        ordering = request.query_params.get('ordering', 'joined_at')
+        if ordering.lstrip('-') not in self.list_orderings:
+            raise ValidationError({
+                'ordering': f'Expected one of: {", ".join(self.list_orderings)} (prefix - for descending).'
+            })
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+    def filter_counts(self, queryset):
+        """Apply the ``?<section>_count__gte=`` and ``__lte=`` bounds"""
+        for field in COUNTER_FIELDS.values():
+            for lookup in ('gte', 'lte'):
+                param = f'{field}__{lookup}'
+                if param not in self.request.query_params:
+                    continue
+                try:
+                    value = int(self.request.query_params[param])
+                except ValueError:
+                    value = -1
+                if value < 0:
+                    raise ValidationError({param: 'Expected a non-negative whole number.'})
+                queryset = queryset.filter(**{param: value})
+        return queryset
+
+    def get_detail_queryset(self):
+        """Profiles with only the requested sections prefetched"""
+        queryset = EmployeeProfile.objects.all()
+        sections = [self.section_prefetch(name) for name in SECTIONS if self.is_expanded(name)]
+        if sections:
+            queryset = queryset.with_sections(*sections)
+        return self.prune_profile_queryset(queryset)
+
+    def prune_profile_queryset(self, queryset):
+        # Join the owner only when it is embedded and load only requested columns
+        if self.is_expanded('owner'):
+            queryset = queryset.select_related('owner')
+        if self.field_tree is not None:
+            columns = model_columns(EmployeeProfile, self.field_tree)
+            ordering = [column.lstrip('-') for column in self.cursor_ordering]
+            queryset = queryset.only('id', *ordering, *columns)
+        return queryset
+
+    def section_prefetch(self, name):
+        subfields = self.requested_subfields(name)
+        if subfields is None:
+            return name
+        model = EmployeeProfile._meta.get_field(name).related_model
+        return Prefetch(name, queryset=model.objects.only('id', 'profile', *model_columns(model, subfields)))
+
+    @conditional_get(object_last_modified)
+    def retrieve(self, request, *args, **kwargs):
+        # Serve the rendered document from the versioned detail cache. Object
+        # permissions only restrict writes, so a hit can skip get_object().
+        # Sparse renderings are not cached.
         try:
-            profile = EmployeeProfile.objects.get(owner=request.user)
-            serializer = EmployeeProfileDetailSerializer(profile)
-            return Response(serializer.data)
-        except EmployeeProfile.DoesNotExist:
+            profile_id = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (KeyError, ValueError):
+            return super().retrieve(request, *args, **kwargs)
+        if self.has_sparse_fieldset():
+            return super().retrieve(request, *args, **kwargs)
+
+        def render():
+            return self.get_serializer(self.get_object()).data
+
+        # Nested image URLs are absolute, so renderings are kept per host
+        data = get_or_render_detail(profile_id, render, variant=request.build_absolute_uri('/'))
+        return Response(data)
+
+    @action(detail=True, methods=['put', 'patch'])
+    def document(self, request, pk=None):
+        """Save a whole CV document, writing only the rows that changed"""
+        return self.save_document(request, self.get_object())
+
+    def save_document(self, request, profile):
+        serializer = self.get_serializer(profile, data=request.data, partial=request.method == 'PATCH')
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        profile = EmployeeProfile.objects.select_related('owner').with_sections().get(pk=profile.pk)
+        data = timed_serializer(EmployeeProfileDetailSerializer)(profile, context=self.get_serializer_context()).data
+        return Response({**data, 'changes': serializer.changes})
+
+    @action(detail=False, methods=['get', 'put', 'patch'], permission_classes=[IsAuthenticated])
+    @conditional_get(own_profile_last_modified)
+    def my_profile(self, request):
+        """Get current user's profile, or save it as a whole CV document"""
+        profile_id = self.queryset.filter(owner=request.user).values_list('id', flat=True).first()
+        if profile_id is None:
             return Response(
                 {'detail': 'Profile not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        if request.method != 'GET':
+            return self.save_document(request, EmployeeProfile.objects.get(id=profile_id))
 
+        def render():
+            profile = self.get_detail_queryset().get(id=profile_id)
+            return self.apply_sparse_fieldset(timed_serializer(EmployeeProfileDetailSerializer)(profile)).data
+
+        if self.has_sparse_fieldset():
+            return Response(render())
+        return Response(get_or_render_detail(profile_id, render))
+
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over positions, bios, skills and projects, best match first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'Missing search query (?q=).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Results are ranked, so they page by number rather than by cursor
+        paginator = PageNumberPagination()
+        ids = paginator.paginate_queryset(ProfileSearchResults(query), request, view=self)
+        profiles = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([profiles[pk] for pk in ids if pk in profiles], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        # Full dump for HR: ?output=ndjson (default) or ?output=csv
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'output': f'Expected one of: {", ".join(sorted(EXPORT_FORMATS))}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        response = StreamingHttpResponse(
+            iter_export(export_format, context={'request': request}),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="profiles.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['get', 'post'])
+    def match(self, request):
+        """Top-K profiles for a set of required skills, e.g. ?skills=python:expert,django&limit=5"""
+        if request.method == 'GET':
+            data = {
+                'skills': [
+                    dict(zip(('name', 'proficiency'), spec.split(':', 1)))
+                    for spec in request.query_params.get('skills', '').split(',') if spec.strip()
+                ],
+                'limit': request.query_params.get('limit', 10),
+            }
+        else:
+            data = request.data
+        serializer = SkillMatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        requirements = [
+            (skill['name'], proficiency_weight(skill['proficiency']) if skill.get('proficiency') else 0.0, skill['weight'])
+            for skill in serializer.validated_data['skills']
+        ]
+        ranked = skill_index.match(requirements, limit=serializer.validated_data['limit'])
+
+        profiles = self.get_queryset().in_bulk([profile_id for profile_id, _, _ in ranked])
+        results = []
+        for profile_id, score, matched in ranked:
+            if profile_id in profiles:
+                results.append({
+                    'profile': self.get_serializer(profiles[profile_id]).data,
+                    'score': round(score, 4),
+                    'matched_skills': matched,
+                })
+        return Response(results)
 
     @action(detail=False, methods=['post', 'put', 'patch'])
     def my_profile_update(self):
@@ -68,10 +278,38 @@ class EmployeeProfileViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class SkillViewSet(viewsets.ModelViewSet):
-    queryset = Skill.objects.all().select_related('profile__owner')
+# Shared by the section viewsets; writes include the profile touch, the
+# reindex of the section's search column and the cache bump done by the
+# signals. Updates peak when they move rows to another of the caller's
+# profiles.
+SECTION_QUERY_BUDGETS = {
+    'list': 3,
+    'retrieve': 3,
+    'create': 8,
+    'update': 9,
+    'partial_update': 9,
+    'destroy': 8,
+    'bulk': 9,
+}
+# Project writes also keep the image reference counts, and delete the
+# files (locking their rows) once no project uses them. A new image's blob
+# row is inserted under a savepoint when the request is already atomic.
+PROJECT_QUERY_BUDGETS = {
+    **SECTION_QUERY_BUDGETS,
+    'create': 11,
+    'update': 17,
+    'partial_update': 17,
+    'destroy': 12,
+    'bulk': 13,
+}
+
+
+class SkillViewSet(BulkSectionMixin, ConditionalRetrieveMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
+    queryset = Skill.objects.all().select_related('profile__owner').order_by('id')
     serializer_class = SkillSerializer
     permission_classes = [IsAuthenticated, IsProfileOwnerOrReadOnly]
+    replica_reads = True
+    query_budgets = {**SECTION_QUERY_BUDGETS, 'my_skills': 3}
 
     def get_queryset(self):
         queryset = self.queryset
@@ -81,7 +319,7 @@ class SkillViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=False, methods=['get'])
-    def my_skills(self):
+    def my_skills(self, request):
         """Get current user's skills"""
         try:
             profile = EmployeeProfile.objects.get(owner=self.request.user)
@@ -94,10 +332,12 @@ class SkillViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class EducationViewSet(viewsets.ModelViewSet):
-    queryset = Education.objects.all().select_related('profile__owner')
+class EducationViewSet(BulkSectionMixin, ConditionalRetrieveMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
+    queryset = Education.objects.all().select_related('profile__owner').order_by('id')
     serializer_class = EducationSerializer
     permission_classes = [IsAuthenticated, IsProfileOwnerOrReadOnly]
+    replica_reads = True
+    query_budgets = {**SECTION_QUERY_BUDGETS, 'my_education': 3}
 
     def get_queryset(self):
         queryset = self.queryset
@@ -107,7 +347,7 @@ class EducationViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=False, methods=['get'])
-    def my_education(self):
+    def my_education(self, request):
         """Get current user's education"""
         try:
             profile = EmployeeProfile.objects.get(owner=self.request.user)
@@ -120,10 +360,14 @@ class EducationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class CertificationViewSet(viewsets.ModelViewSet):
-    queryset = Certification.objects.all().select_related('profile__owner')
+class CertificationViewSet(BulkSectionMixin, ConditionalRetrieveMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
+    queryset = Certification.objects.all().select_related('profile__owner').order_by('id')
     serializer_class = CertificationSerializer
     permission_classes = [IsAuthenticated, IsProfileOwnerOrReadOnly]
+    replica_reads = True
+    query_budgets = {**SECTION_QUERY_BUDGETS, 'my_certifications': 3, 'expiring': 3}
+    expiring_default_days = 30
+    expiring_max_days = 3650
 
     def get_queryset(self):
         queryset = self.queryset
@@ -132,8 +376,36 @@ class CertificationViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(profile=profile_id)
         return queryset
 
+    @property
+    def cursor_ordering(self):
+        # Keyset order must match the index each action scans
+        if self.action == 'expiring':
+            return ('expiry_date', 'id')
+        return ('id',)
+
+    @action(detail=False, methods=['get'])
+    def expiring(self, request):
+        """Certifications expiring within ``?days=`` (default 30), soonest first"""
+        try:
+            days = int(request.query_params.get('days', self.expiring_default_days))
+        except ValueError:
+            days = -1
+        if not 0 <= days <= self.expiring_max_days:
+            return Response(
+                {'days': f'Expected a whole number of days between 0 and {self.expiring_max_days}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        today = timezone.localdate()
+        # A range scan on cert_expiry_date_id_idx, already in page order
+        queryset = self.get_queryset().filter(
+            expiry_date__gte=today, expiry_date__lte=today + timedelta(days=days),
+        ).order_by('expiry_date', 'id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'])
-    def my_certifications(self):
+    def my_certifications(self, request):
         """Get current user's certifications"""
         try:
             profile = EmployeeProfile.objects.get(owner=self.request.user)
@@ -146,10 +418,12 @@ class CertificationViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all().select_related('profile__owner')
+class ProjectViewSet(BulkSectionMixin, ConditionalRetrieveMixin, InstrumentedViewMixin, viewsets.ModelViewSet):
+    queryset = Project.objects.all().select_related('profile__owner').order_by('id')
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, IsProfileOwnerOrReadOnly]
+    replica_reads = True
+    query_budgets = {**PROJECT_QUERY_BUDGETS, 'my_projects': 3}
 
     def get_queryset(self):
         queryset = self.queryset
@@ -159,7 +433,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=False, methods=['get'])
-    def my_projects(self):
+    def my_projects(self, request):
         """Get current user's projects"""
         try:
             profile = EmployeeProfile.objects.get(owner=self.request.user)
@@ -171,9 +445,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 {'detail': 'Profile not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
-class ProfileSkillsView(APIView):
+class ProfileSkillsView(InstrumentedViewMixin, APIView):
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    query_budgets = {'get': 4}
 
+    @conditional_get(profile_last_modified)
     def get(self, request, profile_id):
         # Try to get the profile by id
         try:
@@ -183,11 +460,14 @@ class ProfileSkillsView(APIView):
 
         # Filter skills by the profile
         skills = Skill.objects.filter(profile=profile)
-        serializer = SkillSerializer(skills, many=True)
+        serializer = timed_serializer(SkillSerializer)(skills, many=True)
         return Response(serializer.data)
-class ProfileProjectsView(APIView):
+class ProfileProjectsView(InstrumentedViewMixin, APIView):
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    query_budgets = {'get': 4}
 
+    @conditional_get(profile_last_modified)
     def get(self, request, profile_id):
         try:
             profile = EmployeeProfile.objects.get(id=profile_id)
@@ -195,5 +475,5 @@ class ProfileProjectsView(APIView):
             return Response({'detail': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
         projects = Project.objects.filter(profile=profile)
-        serializer = ProjectSerializer(projects, many=True)
+        serializer = timed_serializer(ProjectSerializer)(projects, many=True)
         return Response(serializer.data)